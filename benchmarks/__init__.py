@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""Benchmarks of the table hot paths over synthetic CSV and Excel files.
+
+Run the benchmarks and write the timings as JSON::
+
+    python -m benchmarks.run --sizes 1000,100000 --output results.json
+
+Compare two runs, exiting with status 1 if any case got slower by more than the threshold::
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.2
+
+SQL cases run on the embedded SQLite engine, and on PostgreSQL when the ``connection_string``
+option of the ``sql`` configuration section is set.
+"""
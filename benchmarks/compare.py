@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""Compare two benchmark runs and flag regressions."""
+import argparse
+import json
+import sys
+
+
+# Statuses counted as regressions.
+REGRESSIONS = ('slower', 'error', 'missing')
+
+
+def compare(baseline, results, threshold=0.1, metric='best'):
+    """Return (key, baseline time, time, ratio, status) for the cases timed in the baseline, where
+    status is 'slower' or 'faster' when the ratio of times is beyond `threshold`, 'same' otherwise,
+    'error' if the case failed in `results` and 'missing' if it was not run. Time and ratio are
+    None for the last two.
+    """
+    rows = []
+    for key, before in sorted(baseline['results'].items()):
+        if metric not in before:
+            continue
+        after = results['results'].get(key)
+        if after is None or metric not in after:
+            status = 'missing' if after is None or 'skipped' in after else 'error'
+            rows.append((key, before[metric], None, None, status))
+            continue
+        ratio = after[metric] / before[metric] if before[metric] else float('inf')
+        if ratio > 1 + threshold:
+            status = 'slower'
+        elif ratio < 1 / (1 + threshold):
+            status = 'faster'
+        else:
+            status = 'same'
+        rows.append((key, before[metric], after[metric], ratio, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark runs.')
+    parser.add_argument('baseline', help='JSON results of the reference run')
+    parser.add_argument('results', help='JSON results of the run to check')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown tolerated (0.1 is 10%%)')
+    parser.add_argument('--metric', choices=('first', 'best', 'mean'), default='best')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        results = json.load(f)
+
+    rows = compare(baseline, results, args.threshold, args.metric)
+    width = max([len(row[0]) for row in rows] + [4])
+    sys.stdout.write('%-*s %10s %10s %7s\n' % (width, 'case', 'baseline', 'time', 'ratio'))
+    for key, before, after, ratio, status in rows:
+        flag = '' if status == 'same' else '  ' + status
+        if after is None:
+            sys.stdout.write('%-*s %10.4f %10s %7s%s\n' % (width, key, before, '-', '-', flag))
+        else:
+            sys.stdout.write('%-*s %10.4f %10.4f %7.2f%s\n' % (width, key, before, after, ratio, flag))
+
+    regressions = [row for row in rows if row[4] in REGRESSIONS]
+    if regressions:
+        sys.stdout.write('%d of %d cases slower by more than %d%%, failing or missing\n'
+                         % (len(regressions), len(rows), args.threshold * 100))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
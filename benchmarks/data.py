@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""Synthetic data files."""
+import os
+import random
+import string
+from collections import OrderedDict
+
+import pandas
+
+
+# Column kinds of each shape, cycled over its number of columns.
+SHAPES = OrderedDict([
+    ('narrow', (3, ('int', 'float', 'str'))),
+    ('wide', (50, ('int', 'float', 'str', 'bool'))),
+    ('numeric', (10, ('int', 'float'))),
+    ('strings', (10, ('str', 'text'))),
+])
+
+# The .xls format holds at most 65536 rows per sheet; larger sheets are written as .xlsx.
+XLS_ROWS = 65535
+
+
+def get_values(kind, rows, rng):
+    if kind == 'int':
+        return [rng.randint(-10 ** 6, 10 ** 6) for _ in xrange(rows)]
+    if kind == 'float':
+        return [rng.random() * 1000 for _ in xrange(rows)]
+    if kind == 'bool':
+        return [rng.random() < 0.5 for _ in xrange(rows)]
+    if kind == 'str':
+        return [''.join(rng.choice(string.ascii_lowercase) for _ in xrange(8)) for _ in xrange(rows)]
+    if kind == 'text':
+        # Longer values with separators and quotes, which take the slower parsing paths.
+        words = ['alpha', 'beta', 'gamma, delta', 'say "hi"', 'epsilon']
+        return [' '.join(rng.choice(words) for _ in xrange(6)) for _ in xrange(rows)]
+    raise ValueError('unknown column kind %s' % kind)
+
+
+def get_dataframe(shape, rows, seed=0):
+    """Return a DataFrame of `rows` rows with the columns of `shape`; the same seed gives the same data."""
+    columns, kinds = SHAPES[shape]
+    rng = random.Random(seed)
+    data = OrderedDict()
+    for i in range(columns):
+        kind = kinds[i % len(kinds)]
+        data['%s%d' % (kind, i)] = get_values(kind, rows, rng)
+    return pandas.DataFrame(data)
+
+
+def get_path(directory, format, shape, rows):
+    if format == 'csv':
+        extension = 'csv'
+    elif format == 'excel':
+        extension = 'xls' if rows <= XLS_ROWS else 'xlsx'
+    else:
+        raise ValueError('unknown format %s' % format)
+    return os.path.join(directory, '%s_%d.%s' % (shape, rows, extension))
+
+
+def generate(directory, format, shape, rows, seed=0):
+    """Write a `format` ('csv' or 'excel') file of `shape` with `rows` rows in `directory`, unless present."""
+    path = get_path(directory, format, shape, rows)
+    if not os.path.exists(path):
+        data = get_dataframe(shape, rows, seed)
+        if format == 'csv':
+            data.to_csv(path, index=False)
+        else:
+            data.to_excel(path, index=False)
+    return path
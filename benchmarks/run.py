@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""Time the table hot paths and write the results as JSON."""
+import argparse
+import ConfigParser
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from collections import OrderedDict
+
+from pyrawcore.core import get_config, get_option, Table
+from pyrawcore.csv import csv
+from pyrawcore.excel import excel
+from pyrawcore.excel.cache import sheets
+from pyrawcore.sql import sql
+from pyrawcore.union import union
+from . import data
+
+
+FORMATS = OrderedDict([('csv', csv), ('excel', excel)])
+
+# Cases by name: functions of (make, rows) returning the operation to time, where `make()` returns
+# a new table over the data file. Work done before returning is setup and is not timed.
+CASES = OrderedDict()
+
+# Random positions read by the 'key' case.
+KEYS = 100
+
+# Rows read by the 'slice' case.
+SLICE = 1000
+
+
+class Skipped(Exception):
+    pass
+
+
+def case(name):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+def scan(table):
+    n = 0
+    for _ in table:
+        n += 1
+    return n
+
+
+def get_first_column(table):
+    return next(iter(table.schema()))
+
+
+@case('scan')
+def scan_case(make, rows):
+    table = make()
+    return lambda: scan(table)
+
+
+@case('batches')
+def batches_case(make, rows):
+    table = make()
+    return lambda: sum(len(batch) for batch in table.iter_batches())
+
+
+@case('key')
+def key_case(make, rows):
+    table = make()
+    positions = random.Random(0).sample(xrange(rows), min(KEYS, rows))
+    return lambda: [table[i] for i in positions]
+
+
+@case('slice')
+def slice_case(make, rows):
+    table = make()
+    start = rows // 2
+    return lambda: list(table[start:start + SLICE])
+
+
+@case('column')
+def column_case(make, rows):
+    table = make()
+    name = get_first_column(table)
+    return lambda: list(table[name])
+
+
+@case('added')
+def added_case(make, rows):
+    table = make()
+    name = get_first_column(table)
+    table['added'] = lambda row: row[name]
+    return lambda: scan(table)
+
+
+@case('added_vectorized')
+def added_vectorized_case(make, rows):
+    table = make()
+    name = get_first_column(table)
+    table.add_column('added', lambda chunk: chunk[name], vectorized=True)
+    return lambda: scan(table)
+
+
+@case('pandas_dataframe')
+def pandas_dataframe_case(make, rows):
+    table = make()
+    return lambda: table.pandas_dataframe()
+
+
+@case('repr_html')
+def repr_html_case(make, rows):
+    table = make()
+    return lambda: table._repr_html_()
+
+
+@case('union')
+def union_case(make, rows):
+    table = union(make(), make())
+    return lambda: scan(table)
+
+
+@case('sql_sqlite')
+def sql_sqlite_case(make, rows):
+    return lambda: scan(sql("SELECT * FROM t", engine='sqlite', t=make()))
+
+
+@case('sql_postgres')
+def sql_postgres_case(make, rows):
+    if not get_option('sql', 'connection_string'):
+        raise Skipped('no sql/connection_string option')
+    return lambda: scan(sql("SELECT * FROM t", engine='postgres', t=make()))
+
+
+def use_cache_path(directory):
+    """Point the 'files'/'cache_path' option at `directory`, keeping the other configured options.
+
+    Returns the previous RAW_CONFIG environment variable.
+    """
+    config = ConfigParser.RawConfigParser()
+    current = get_config()
+    if current is not None:
+        for section in current.sections():
+            config.add_section(section)
+            for key, value in current.items(section):
+                config.set(section, key, value)
+    if not config.has_section('files'):
+        config.add_section('files')
+    config.set('files', 'cache_path', directory)
+    path = os.path.join(os.path.dirname(directory), 'raw.config')
+    with open(path, 'w') as f:
+        config.write(f)
+    previous = os.environ.get('RAW_CONFIG')
+    os.environ['RAW_CONFIG'] = path
+    return previous
+
+
+def clear_caches(directory):
+    """Drop the sheet, schema and on-disk caches (row indexes, counts, column caches) of earlier cases."""
+    sheets.clear()
+    Table._schemas.clear()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def measure(func, repeat):
+    """Return the first (cold), best and mean wall times, in seconds, of `repeat` calls to `func`.
+
+    Callers clear the caches first for the first call to be cold; later calls reuse what it cached.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = timeit.default_timer()
+        func()
+        times.append(timeit.default_timer() - start)
+    return OrderedDict([('first', times[0]), ('best', min(times)), ('mean', sum(times) / len(times)),
+                        ('repeat', repeat)])
+
+
+def run(directory, formats, shapes, sizes, cases, repeat=3, excel_rows=10000, log=None):
+    """Run `cases` over the files of every format, shape and size, and return the results by
+    '<format>/<shape>/<rows>/<case>' key. Excel files are limited to `excel_rows` rows.
+    """
+    results = OrderedDict()
+    cache_path = os.path.join(directory, 'cache')
+    previous = use_cache_path(cache_path)
+    try:
+        run_cases(directory, cache_path, formats, shapes, sizes, cases, repeat, excel_rows, log, results)
+    finally:
+        if previous is None:
+            del os.environ['RAW_CONFIG']
+        else:
+            os.environ['RAW_CONFIG'] = previous
+    return results
+
+
+def run_cases(directory, cache_path, formats, shapes, sizes, cases, repeat, excel_rows, log, results):
+    for format in formats:
+        for shape in shapes:
+            for rows in sizes:
+                if format == 'excel' and rows > excel_rows:
+                    continue
+                path = data.generate(directory, format, shape, rows)
+                make = lambda: FORMATS[format](path)
+                for name in cases:
+                    key = '%s/%s/%d/%s' % (format, shape, rows, name)
+                    try:
+                        func = CASES[name](make, rows)
+                        clear_caches(cache_path)
+                        results[key] = measure(func, repeat)
+                    except Skipped as e:
+                        results[key] = OrderedDict([('skipped', str(e))])
+                    except Exception as e:
+                        results[key] = OrderedDict([('error', '%s: %s' % (type(e).__name__, e))])
+                    if log:
+                        log.write('%s %s\n' % (key, json.dumps(results[key])))
+
+
+def get_list(value, choices=None):
+    values = [v for v in value.split(',') if v]
+    if choices is not None:
+        for v in values:
+            if v not in choices:
+                raise argparse.ArgumentTypeError('%s is not one of %s' % (v, ', '.join(choices)))
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the table hot paths over synthetic data files.')
+    parser.add_argument('--formats', type=lambda v: get_list(v, FORMATS), default=list(FORMATS))
+    parser.add_argument('--shapes', type=lambda v: get_list(v, data.SHAPES), default=list(data.SHAPES))
+    parser.add_argument('--sizes', type=lambda v: [int(s) for s in get_list(v)], default=[1000, 100000])
+    parser.add_argument('--cases', type=lambda v: get_list(v, CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--excel-rows', type=int, default=10000, help='largest Excel file, in rows')
+    parser.add_argument('--data', help='directory keeping the generated files between runs')
+    parser.add_argument('--output', help='JSON file to write, instead of standard output')
+    args = parser.parse_args(argv)
+
+    directory = args.data or tempfile.mkdtemp(prefix='pyrawcore_benchmarks')
+    try:
+        results = run(directory, args.formats, args.shapes, args.sizes, args.cases, args.repeat, args.excel_rows,
+                      log=sys.stderr)
+    finally:
+        if not args.data:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report = OrderedDict([
+        ('meta', OrderedDict([('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+                              ('python', platform.python_version()),
+                              ('platform', platform.platform()),
+                              ('repeat', args.repeat)])),
+        ('results', results),
+    ])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -24,15 +24,23 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
-from .config import get_config, get_option
+from .config import get_bool_option, get_config, get_float_option, get_int_option, get_option, Setting
 from .loader import load
+from .row import Row
+from .stats import set_stats_sink
 from .table import Table
 from .tablify import is_table
 
 __all__ = [
+    'get_bool_option',
     'get_config',
+    'get_float_option',
+    'get_int_option',
     'get_option',
     'load',
+    'Row',
+    'Setting',
+    'set_stats_sink',
     'Table',
     'is_table',
 ]
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import errno
+import hashlib
+import json
+import os
+import tempfile
+
+from .config import get_option
+
+
+def get_cache_path(name):
+    """Return the cache directory for `name`, creating it if needed."""
+    base = get_option('files', 'cache_path')
+    if not base:
+        base = os.path.join(os.path.realpath(tempfile.gettempdir()), 'pyrawcore')
+    path = os.path.join(base, name)
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return path
+
+def get_key(*values):
+    """Return a stable hex digest for a tuple of JSON-like values."""
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=repr)).hexdigest()
+
+def get_file_stamp(path):
+    """Return the (size, mtime) pair used to invalidate cached data about `path`."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime
+
+def write_json(path, data):
+    """Atomically replace the JSON file at `path`."""
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.rename(tmp, path)
+
+def read_json(path):
+    """Return the contents of the JSON file at `path`, or None if unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
@@ -25,9 +25,14 @@
 # SOFTWARE.
 #
 import os
+import threading
 import ConfigParser
 
 
+BOOLEANS = {'1': True, 'yes': True, 'true': True, 'on': True,
+            '0': False, 'no': False, 'false': False, 'off': False}
+
+
 def get_config_path():
     for p in [os.environ.get('RAW_CONFIG'),
               os.path.expanduser('~/.raw/raw.config'),
@@ -36,16 +41,79 @@ def get_config_path():
             return p
     return None
 
+
+class ConfigFile(object):
+    """Configuration file, parsed on first use and parsed again only when its path or modification time changes."""
+
+    def __init__(self):
+        self.__stamp = None
+        self.__config = None
+        self.__lock = threading.Lock()
+
+    def get(self):
+        p = get_config_path()
+        try:
+            stamp = (p, os.stat(p).st_mtime) if p else None
+        except OSError:
+            stamp = None
+        if stamp != self.__stamp:
+            with self.__lock:
+                if stamp != self.__stamp:
+                    config = None
+                    if stamp:
+                        config = ConfigParser.RawConfigParser()
+                        config.read(p)
+                    self.__config, self.__stamp = config, stamp
+        return self.__config
+
+
+_file = ConfigFile()
+
+
 def get_config():
-    p = get_config_path()
-    if not p:
-        return None
-    config = ConfigParser.RawConfigParser()
-    config.read(p)
-    return config
-
-def get_option(section, key):
+    """Return the parsed configuration file, shared by all callers, or None without one."""
+    return _file.get()
+
+def get_option(section, key, default=None):
     c = get_config()
-    if not c:
-        return None
+    if not c or not c.has_option(section, key):
+        return default
     return c.get(section, key)
+
+def get_typed_option(section, key, default, type):
+    value = get_option(section, key)
+    if value is None:
+        return default
+    try:
+        if type is bool:
+            return BOOLEANS[value.lower()]
+        return type(value)
+    except KeyError:
+        raise ValueError('option %s/%s is not a valid bool: %r' % (section, key, value))
+    except ValueError:
+        raise ValueError('option %s/%s is not a valid %s: %r' % (section, key, type.__name__, value))
+
+def get_int_option(section, key, default=None):
+    return get_typed_option(section, key, default, int)
+
+def get_float_option(section, key, default=None):
+    return get_typed_option(section, key, default, float)
+
+def get_bool_option(section, key, default=None):
+    return get_typed_option(section, key, default, bool)
+
+
+class Setting(object):
+    """Class attribute read from the `section`/`key` option, converted to `type`, or `default` when not set.
+
+    Assigning the attribute on an instance or a subclass overrides the option.
+    """
+
+    def __init__(self, section, key, default, type=int):
+        self.section = section
+        self.key = key
+        self.default = default
+        self.type = type
+
+    def __get__(self, instance, owner):
+        return get_typed_option(self.section, self.key, self.default, self.type)
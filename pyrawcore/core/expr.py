@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""Filter expressions.
+
+Expressions support comparisons (``=``, ``!=``, ``<>``, ``<``, ``<=``, ``>``, ``>=``), ``AND``,
+``OR``, ``NOT``, ``IN (...)``, ``IS [NOT] NULL`` and parentheses, over column names (optionally
+double-quoted) and number, single-quoted string, ``TRUE``, ``FALSE`` and ``NULL`` literals::
+
+    a > 1 AND (b IN ('x', 'y') OR c IS NULL)
+
+They are parsed into JSON-serializable lists, evaluated as NumPy masks over DataFrame chunks or
+over single records, and translated to SQL. Evaluation follows SQL's three-valued logic: a
+comparison involving a missing value is unknown, and only rows where the expression is true match.
+"""
+import datetime
+import operator
+import re
+
+import numpy
+import pandas
+
+
+TOKEN = re.compile(r"""\s*(?:
+    (?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?) |
+    (?P<string>'(?:[^']|'')*') |
+    (?P<quoted>"(?:[^"]|"")*") |
+    (?P<name>[A-Za-z_][A-Za-z0-9_]*) |
+    (?P<op><=|>=|<>|!=|==|=|<|>|\(|\)|,)
+)""", re.VERBOSE)
+
+KEYWORDS = ('and', 'or', 'not', 'in', 'is', 'null', 'true', 'false')
+
+OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+SQL_OPERATORS = {
+    '=': '=',
+    '!=': '<>',
+    '<': '<',
+    '<=': '<=',
+    '>': '>',
+    '>=': '>=',
+}
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError('invalid filter expression at %r' % text[pos:])
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'number':
+            value = float(value) if any(c in value for c in '.eE') else int(value)
+        elif kind == 'string':
+            value = value[1:-1].replace("''", "'")
+        elif kind == 'quoted':
+            kind, value = 'name', value[1:-1].replace('""', '"')
+        elif kind == 'name' and value.lower() in KEYWORDS:
+            kind, value = 'keyword', value.lower()
+        elif kind == 'op':
+            value = {'==': '=', '<>': '!='}.get(value, value)
+        tokens.append((kind, value))
+    return tokens
+
+
+class Parser(object):
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self, kind, value=None):
+        if self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            return token[0] == kind and (value is None or token[1] == value)
+        return False
+
+    def accept(self, kind, value=None):
+        if self.peek(kind, value):
+            self.pos += 1
+            return self.tokens[self.pos - 1][1]
+        return None
+
+    def expect(self, kind, value=None):
+        if not self.peek(kind, value):
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else 'end of expression'
+            raise ValueError('invalid filter expression: expected %s, found %r' % (value or kind, found))
+        return self.accept(kind, value)
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise ValueError('invalid filter expression: unexpected %r' % (self.tokens[self.pos][1],))
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.accept('keyword', 'or'):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ['or'] + nodes
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.accept('keyword', 'and'):
+            nodes.append(self.parse_not())
+        return conjunction(nodes)
+
+    def parse_not(self):
+        if self.accept('keyword', 'not'):
+            return ['not', self.parse_not()]
+        return self.parse_predicate()
+
+    def parse_predicate(self):
+        if self.accept('op', '('):
+            node = self.parse_or()
+            self.expect('op', ')')
+            return node
+
+        left = self.parse_operand()
+        if self.peek('op') and self.tokens[self.pos][1] in OPERATORS:
+            op = self.accept('op')
+            return ['cmp', op, left, self.parse_operand()]
+        if self.accept('keyword', 'is'):
+            negated = self.accept('keyword', 'not')
+            self.expect('keyword', 'null')
+            node = ['isnull', left]
+            return ['not', node] if negated else node
+        negated = self.accept('keyword', 'not')
+        if negated or self.peek('keyword', 'in'):
+            self.expect('keyword', 'in')
+            self.expect('op', '(')
+            values = [self.parse_literal()]
+            while self.accept('op', ','):
+                values.append(self.parse_literal())
+            self.expect('op', ')')
+            node = ['in', left, values]
+            return ['not', node] if negated else node
+        raise ValueError('invalid filter expression: expected a comparison')
+
+    def parse_operand(self):
+        name = self.accept('name')
+        if name is not None:
+            return ['column', name]
+        return ['value', self.parse_literal()]
+
+    def parse_literal(self):
+        for kind in ('number', 'string'):
+            if self.peek(kind):
+                return self.accept(kind)
+        for keyword, value in (('null', None), ('true', True), ('false', False)):
+            if self.accept('keyword', keyword):
+                return value
+        self.expect('value')
+
+
+def parse(text):
+    """Parse a filter expression into its JSON-serializable form."""
+    return Parser(text).parse()
+
+def conjuncts(node):
+    """Return the list of expressions AND-ed together in `node`."""
+    if node is None:
+        return []
+    if node[0] == 'and':
+        return node[1:]
+    return [node]
+
+def conjunction(nodes):
+    """Return the expression AND-ing `nodes`, or None if there are none."""
+    if not nodes:
+        return None
+    if len(nodes) == 1:
+        return nodes[0]
+    return ['and'] + [n for node in nodes for n in conjuncts(node)]
+
+def get_columns(node):
+    """Return the set of column names used in an expression."""
+    if node is None:
+        return set()
+    if node[0] == 'column':
+        return set([node[1]])
+    if node[0] == 'value':
+        return set()
+    if node[0] == 'in':
+        return get_columns(node[1])
+    if node[0] == 'cmp':
+        return get_columns(node[2]) | get_columns(node[3])
+    return set().union(*[get_columns(child) for child in node[1:]])
+
+def evaluate_operand(node, data):
+    value = data[node[1]] if node[0] == 'column' else node[1]
+    return value.values if isinstance(value, pandas.Series) else value
+
+def coerce_operand(value, other):
+    """Convert a string compared with dates to a date, as SQL casts such literals."""
+    if not isinstance(value, basestring):
+        return value
+    if isinstance(other, numpy.ndarray) and other.dtype.kind == 'M':
+        return pandas.Timestamp(value).to_datetime64()
+    if isinstance(other, (datetime.datetime, numpy.datetime64)):
+        return pandas.Timestamp(value)
+    if isinstance(other, datetime.date):
+        return pandas.Timestamp(value).date()
+    return value
+
+def evaluate_truth(node, data):
+    """Return the (true, false) masks or booleans of an expression; both are false when it is unknown."""
+    kind = node[0]
+    if kind == 'and':
+        true, false = evaluate_truth(node[1], data)
+        for child in node[2:]:
+            child_true, child_false = evaluate_truth(child, data)
+            true, false = numpy.logical_and(true, child_true), numpy.logical_or(false, child_false)
+        return true, false
+    if kind == 'or':
+        true, false = evaluate_truth(node[1], data)
+        for child in node[2:]:
+            child_true, child_false = evaluate_truth(child, data)
+            true, false = numpy.logical_or(true, child_true), numpy.logical_and(false, child_false)
+        return true, false
+    if kind == 'not':
+        true, false = evaluate_truth(node[1], data)
+        return false, true
+    if kind == 'isnull':
+        missing = pandas.isnull(evaluate_operand(node[1], data))
+        return missing, numpy.logical_not(missing)
+    if kind == 'in':
+        value = evaluate_operand(node[1], data)
+        values = [v for v in node[2] if v is not None]
+        # Like SQL, a value not found is unknown, rather than false, if the list holds a NULL.
+        listed_null = len(values) < len(node[2])
+        missing = pandas.isnull(value)
+        if isinstance(value, numpy.ndarray):
+            found = pandas.Series(value).isin(values).values
+            if listed_null:
+                return found & ~missing, numpy.zeros(len(found), dtype=bool)
+            return found & ~missing, ~found & ~missing
+        if missing:
+            return False, False
+        found = value in values
+        return found, not found and not listed_null
+    if kind == 'cmp':
+        left, right = evaluate_operand(node[2], data), evaluate_operand(node[3], data)
+        left, right = coerce_operand(left, right), coerce_operand(right, left)
+        missing = numpy.logical_or(pandas.isnull(left), pandas.isnull(right))
+        if not isinstance(missing, numpy.ndarray):
+            if missing:
+                return False, False
+            result = bool(OPERATORS[node[1]](left, right))
+            return result, not result
+        with numpy.errstate(invalid='ignore'):
+            result = numpy.asarray(OPERATORS[node[1]](left, right), dtype=bool)
+        return result & ~missing, ~result & ~missing
+    raise ValueError('invalid filter expression node %r' % kind)
+
+def evaluate(node, data):
+    """Return whether a record matches an expression."""
+    return bool(evaluate_truth(node, data)[0])
+
+def evaluate_mask(node, chunk):
+    """Return the boolean mask of the rows of a DataFrame chunk matching an expression."""
+    mask = evaluate_truth(node, chunk)[0]
+    if numpy.ndim(mask) == 0:
+        return numpy.repeat(bool(mask), len(chunk))
+    return numpy.asarray(mask, dtype=bool)
+
+def quote_name(name):
+    return '"%s"' % name.replace('"', '""')
+
+def quote_value(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, long)):
+        return str(value)  # repr() of a long ends with L
+    if isinstance(value, float):
+        return repr(value)
+    return "'%s'" % value.replace("'", "''")
+
+def to_sql(node):
+    """Translate an expression to a SQL condition."""
+    kind = node[0]
+    if kind == 'column':
+        return quote_name(node[1])
+    if kind == 'value':
+        return quote_value(node[1])
+    if kind in ('and', 'or'):
+        return '(%s)' % (' %s ' % kind.upper()).join(to_sql(child) for child in node[1:])
+    if kind == 'not':
+        return '(NOT %s)' % to_sql(node[1])
+    if kind == 'isnull':
+        return '(%s IS NULL)' % to_sql(node[1])
+    if kind == 'in':
+        return '(%s IN (%s))' % (to_sql(node[1]), ', '.join(quote_value(v) for v in node[2]))
+    if kind == 'cmp':
+        return '(%s %s %s)' % (to_sql(node[2]), SQL_OPERATORS[node[1]], to_sql(node[3]))
+    raise ValueError('invalid filter expression node %r' % kind)
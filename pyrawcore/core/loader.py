@@ -26,6 +26,8 @@
 #
 import importlib
 
+from .plan import expand, is_compact
+
 
 def __import(resource_name):
     """Dynamically load module based on resource name."""
@@ -35,5 +37,7 @@ def __import(resource_name):
         raise NotImplementedError(resource_name)
 
 def load(json):
-    """Load resource from json."""
+    """Load resource from json, or from a compact plan."""
+    if is_compact(json):
+        json = expand(json)
     return __import(json['name']).load(json['payload'])
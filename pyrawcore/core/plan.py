@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""Compact plans: resource JSON with each added-column function stored once.
+
+A compact plan is a dict with the encoded functions, keyed by the SHA-1 digest of their
+encoding, and the resource JSON in which functions are replaced by their digest. Nested
+resources (e.g. the tables of a SQL query or a union) sharing a function share one copy.
+"""
+import hashlib
+
+
+VERSION = 1
+
+
+def is_compact(json):
+    return isinstance(json, dict) and 'functions' in json and 'plan' in json
+
+
+def __map_functions(json, func):
+    """Return a copy of resource `json` with every encoded function `f` replaced by `func(f)`."""
+    if isinstance(json, dict):
+        result = {}
+        for key, value in json.items():
+            if key == 'columns_added' and isinstance(value, list):
+                result[key] = [(name, func(f)) for name, f in value]
+            else:
+                result[key] = __map_functions(value, func)
+        return result
+    if isinstance(json, list):
+        return [__map_functions(value, func) for value in json]
+    return json
+
+
+def compact(json):
+    """Return the compact plan of resource `json`."""
+    functions = {}
+
+    def store(f):
+        digest = hashlib.sha1(f).hexdigest()
+        functions[digest] = f
+        return digest
+
+    plan = __map_functions(json, store)
+    return dict(version=VERSION, functions=functions, plan=plan)
+
+
+def expand(plan):
+    """Return the resource JSON of compact `plan`."""
+    if plan.get('version', VERSION) > VERSION:
+        raise NotImplementedError('plan version %s' % plan['version'])
+    functions = plan['functions']
+    return __map_functions(plan['plan'], lambda digest: functions[digest])
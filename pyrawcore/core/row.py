@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import collections
+
+
+class Schema(object):
+    """Column names and positions shared by all the rows of a scan.
+
+    `names` are the visible columns and `indexes` their positions in the row values, which
+    may hold extra hidden values.
+    """
+
+    __slots__ = ('names', 'indexes', 'positions')
+
+    def __init__(self, names, visible=None):
+        positions = dict((name, i) for i, name in enumerate(names))
+        self.names = tuple(names if visible is None else visible)
+        self.indexes = tuple(positions[name] for name in self.names)
+        self.positions = dict((name, positions[name]) for name in self.names)
+
+    def __reduce__(self):
+        return (Schema._from_positions, (self.names, self.indexes))
+
+    @staticmethod
+    def _from_positions(names, indexes):
+        schema = Schema(())
+        schema.names = names
+        schema.indexes = indexes
+        schema.positions = dict(zip(names, indexes))
+        return schema
+
+
+class Row(object):
+    """Compact record: a list of values plus a reference to the schema shared by its scan.
+
+    Rows support read-only mapping access (`row['a']`, `keys()`, `items()`, ...) and compare
+    equal to dicts holding the same items.
+    """
+
+    __slots__ = ('_schema', '_values')
+
+    def __init__(self, schema, values):
+        self._schema = schema
+        self._values = values
+
+    def __reduce__(self):
+        return (Row, (self._schema, self._values))
+
+    def __getitem__(self, name):
+        return self._values[self._schema.positions[name]]
+
+    def get(self, name, default=None):
+        i = self._schema.positions.get(name)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, name):
+        return name in self._schema.positions
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self._schema.names)
+
+    def __len__(self):
+        return len(self._schema.names)
+
+    def keys(self):
+        return list(self._schema.names)
+
+    def values(self):
+        values = self._values
+        return [values[i] for i in self._schema.indexes]
+
+    def items(self):
+        return zip(self._schema.names, self.values())
+
+    def iterkeys(self):
+        return iter(self._schema.names)
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (Row, collections.OrderedDict)):
+            return self.items() == list(other.items())
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Row(%r)' % self.items()
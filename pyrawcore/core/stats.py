@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import collections
+import contextlib
+import timeit
+
+
+# Called with the table and its statistics at the end of each scan of tables without a sink of their own.
+_sink = None
+
+
+def set_stats_sink(sink):
+    """Set the function called with `(table, stats)` at the end of each scan of tables collecting statistics.
+
+    Use it to forward statistics to an external metrics system; None removes it.
+    """
+    global _sink
+    _sink = sink
+
+
+class Stats(object):
+    """Counters and timings, in seconds, of the scans of one table.
+
+    Counters are added up across scans. Timings of added columns are kept by column name.
+    Statistics are not synchronized: a table should not be scanned by several threads at once
+    while collecting them.
+    """
+
+    def __init__(self, sink=None):
+        self.counters = collections.OrderedDict()
+        self.columns = collections.OrderedDict()
+        self.sink = sink
+
+    def add(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = timeit.default_timer()
+        try:
+            yield
+        finally:
+            self.add(name, timeit.default_timer() - start)
+
+    def timed_chunks(self, chunks, name='parse_time'):
+        """Iterate over `chunks`, counting them and adding the time spent producing them to `name`."""
+        chunks = iter(chunks)
+        while True:
+            start = timeit.default_timer()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                self.add(name, timeit.default_timer() - start)
+                return
+            self.add(name, timeit.default_timer() - start)
+            self.add('chunks')
+            yield chunk
+
+    def timed_column(self, name, func):
+        """Return `func`, adding the time spent in each call to the timing of added column `name`."""
+        columns = self.columns
+        columns.setdefault(name, 0.0)
+
+        def timed(*args):
+            start = timeit.default_timer()
+            try:
+                return func(*args)
+            finally:
+                columns[name] += timeit.default_timer() - start
+        return timed
+
+    def to_dict(self):
+        stats = collections.OrderedDict(self.counters)
+        stats['columns'] = collections.OrderedDict(self.columns)
+        return stats
+
+    def flush(self, table):
+        """Send the statistics of `table` to its sink, or to the process' sink."""
+        sink = self.sink or _sink
+        if sink is not None:
+            sink(table, self.to_dict())
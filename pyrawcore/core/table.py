@@ -28,32 +28,125 @@ import base64
 import collections
 import cPickle
 
-import cloud
-import matplotlib
 import numpy
 import pandas
-import prettytable
+from . import expr
+from .cache import get_key
+from .config import Setting
+from .plan import compact
+from .row import Row, Schema
+from .stats import Stats
+from .tablify import get_batch_schema
 
 
+# Decoded functions by encoding, shared by all the tables loaded in the process.
+_functions = {}
+
+# Functions kept decoded; the memo is cleared when full.
+FUNCTIONS_SIZE = 1024
+
 def decode_func(f):
-    return cPickle.loads(base64.b64decode(f))
+    func = _functions.get(f)
+    if func is None:
+        if len(_functions) >= FUNCTIONS_SIZE:
+            _functions.clear()
+        func = _functions[f] = cPickle.loads(base64.b64decode(f))
+    return func
 
 def encode_func(f):
+    # cloud is slow to import and only needed to serialize user code.
+    import cloud
     return base64.b64encode(cloud.serialization.cloudpickle.dumps(f))
 
 
 class Table(object):
 
-    def __init__(self, columns_added=[], columns_hidden=[]):
+    # Default number of rows per batch in iter_batches().
+    CHUNK_SIZE = Setting('table', 'chunk_size', 10000)
+
+    # Record types produced when iterating: OrderedDict, or compact rows sharing one schema per scan.
+    ROW_TYPES = ('dict', 'compact')
+
+    # Whether the backend evaluates filters over source columns itself (e.g. in a WHERE clause).
+    FILTER_PUSHDOWN = False
+
+    # Rows sampled to infer the column types.
+    SCHEMA_SAMPLE = Setting('table', 'schema_sample', 100)
+
+    # Inferred schemas by table fingerprint; the memo is cleared when full.
+    _schemas = {}
+    SCHEMAS_SIZE = 1024
+
+    def __init__(self, columns_added=[], columns_hidden=[], columns_vectorized=[], columns_inputs=None,
+                 columns_selected=None, filter=None, row_type='dict'):
         self._columns_added = collections.OrderedDict(columns_added)
         self._columns_hidden = set(columns_hidden)
+        self._columns_vectorized = set(columns_vectorized)
+        self._columns_inputs = dict(columns_inputs or {})
+        self._columns_selected = None if columns_selected is None else list(columns_selected)
+        self._filter = filter
+        self._stats = None
+        self.row_type = row_type
+
+    @property
+    def row_type(self):
+        """Type of the records produced by the table: ``'dict'`` (OrderedDict, the default) or
+        ``'compact'`` (:class:`Row`, which shares one schema across the rows of a scan).
+        """
+        return self._row_type
+
+    @row_type.setter
+    def row_type(self, row_type):
+        if row_type not in Table.ROW_TYPES:
+            raise ValueError('row_type is not dict or compact')
+        self._row_type = row_type
+        self._reset_plans()
+
+    def _reset_plans(self):
+        """Drop the per-scan state derived from the table's columns and filter."""
+        self.__row_plan = None
+        self.__filters = None
+        self.__encoded = None
+        # Added columns' functions as called by scans, timed when collecting statistics.
+        self.__functions = self._columns_added
+        if self._stats is not None:
+            self.__functions = collections.OrderedDict(
+                (name, self._stats.timed_column(name, func)) for name, func in self._columns_added.items())
+
+    def _encode_options(self):
+        """Return the payload fields shared by all tables."""
+        return dict(
+            columns_added=self._encode_columns_added(),
+            columns_hidden=self._encode_columns_hidden(),
+            columns_vectorized=self._encode_columns_vectorized(),
+            columns_inputs=self._columns_inputs,
+            columns_selected=self._columns_selected,
+            filter=self._filter,
+            row_type=self._row_type)
+
+    @staticmethod
+    def _decode_options(payload):
+        """Return the constructor arguments shared by all tables."""
+        return dict(
+            columns_added=Table._decode_columns_added(payload),
+            columns_hidden=Table._decode_columns_hidden(payload),
+            columns_vectorized=Table._decode_columns_vectorized(payload),
+            columns_inputs=payload.get('columns_inputs'),
+            columns_selected=payload.get('columns_selected'),
+            filter=payload.get('filter'),
+            row_type=payload.get('row_type', 'dict'))
 
     def _encode_columns_added(self):
-        return [(name, encode_func(func)) for name, func in self._columns_added.items()]
+        if self.__encoded is None:
+            self.__encoded = [(name, encode_func(func)) for name, func in self._columns_added.items()]
+        return list(self.__encoded)
 
     def _encode_columns_hidden(self):
         return list(self._columns_hidden)
 
+    def _encode_columns_vectorized(self):
+        return list(self._columns_vectorized)
+
     @staticmethod
     def _decode_columns_added(payload):
         return [(name, decode_func(func)) for name, func in payload['columns_added']]
@@ -62,33 +155,349 @@ class Table(object):
     def _decode_columns_hidden(payload):
         return payload['columns_hidden']
 
-    def _new_tuple_from_dict(self, values_dict):
-        attrs = dict()
-        for name, value in values_dict.items():         # Build record
-            attrs[name] = value
-        for name, func in self._columns_added.items():  # Add extra columns
-            attrs[name] = func(attrs)
-        for name in self._columns_hidden:               # Remove hidden columns
-            del attrs[name]
-        return attrs
+    @staticmethod
+    def _decode_columns_vectorized(payload):
+        return payload.get('columns_vectorized', [])
+
+    def to_plan(self):
+        """Return the table's JSON in the compact plan format, which stores each added-column function once.
+
+        Plans are loaded with :func:`pyrawcore.core.load`, like the JSON returned by ``to_json()``.
+        """
+        return compact(self.to_json())
+
+    def _get_output_names(self, names):
+        """Return the output columns, in order, given the `names` of a record's columns."""
+        if self._columns_selected is None:
+            return [name for name in names if name not in self._columns_hidden]
+        available = set(names)
+        for name in self._columns_selected:
+            if name not in available:
+                raise KeyError('column %s not found' % name)
+        return [name for name in self._columns_selected if name not in self._columns_hidden]
+
+    def _get_projection(self, names):
+        """Return the source columns among `names` needed to produce the output, or None if all are.
+
+        Added columns whose inputs are not declared are assumed to need every column.
+        """
+        if self._columns_selected is None:
+            wanted = (set(names) | set(self._columns_added)) - self._columns_hidden
+        else:
+            wanted = set(self._columns_selected) - self._columns_hidden
+        wanted.update(expr.get_columns(self._filter))
+        for name in reversed(self._columns_added.keys()):
+            if name in wanted:
+                inputs = self._columns_inputs.get(name)
+                if inputs is None:
+                    return None
+                wanted.update(inputs)
+        needed = [name for name in names if name in wanted]
+        if len(needed) == len(names):
+            return None
+        return needed
+
+    def _get_filters(self, extra=None):
+        """Split the filter, AND-ed with the `extra` expression, by the stage evaluating it.
+
+        Returns the (source, chunk, row) expressions, each None if empty: conditions over source
+        columns only, conditions that also use vectorized columns, and conditions that use
+        per-row added columns.
+        """
+        if extra is None and self.__filters is not None:
+            return self.__filters
+        stages = ([], [], [])
+        for node in expr.conjuncts(self._filter) + expr.conjuncts(extra):
+            names = expr.get_columns(node) & set(self._columns_added)
+            if names - self._columns_vectorized:
+                stages[2].append(node)
+            elif names:
+                stages[1].append(node)
+            else:
+                stages[0].append(node)
+        filters = tuple(expr.conjunction(stage) for stage in stages)
+        if extra is None:
+            self.__filters = filters
+        return filters
+
+    def _filter_chunk(self, chunk, node):
+        if node is None:
+            return chunk
+        return chunk[expr.evaluate_mask(node, chunk)]
+
+    def _timed_chunks(self, chunks, name='parse_time'):
+        """Return the chunks read by the backend, counted and timed under `name` when collecting statistics."""
+        if self._stats is None:
+            return chunks
+        return self._stats.timed_chunks(chunks, name)
+
+    def __counted_rows(self, rows):
+        stats = self._stats
+        stats.add('scans')
+        n = 0
+        try:
+            for row in rows:
+                n += 1
+                yield row
+        finally:
+            stats.add('rows', n)
+            stats.flush(self)
+
+    def __counted_batches(self, batches):
+        stats = self._stats
+        stats.add('scans')
+        try:
+            for batch in batches:
+                stats.add('batches')
+                stats.add('rows', len(batch))
+                yield batch
+        finally:
+            stats.flush(self)
+
+    def enable_stats(self, sink=None):
+        """Collect execution statistics of the table's scans, read with :meth:`stats`.
+
+        :param sink: Function called with the table and its statistics at the end of each scan, e.g.
+            to forward them to a metrics system. Defaults to the one set with :func:`pyrawcore.core.set_stats_sink`.
+        :type sink: callable
+        """
+        self._stats = Stats(sink)
+        self._reset_plans()
+        return self
+
+    def disable_stats(self):
+        """Stop collecting execution statistics."""
+        self._stats = None
+        self._reset_plans()
+        return self
+
+    def stats(self):
+        """Return the execution statistics collected since :meth:`enable_stats`, or None if disabled.
+
+        Statistics are an OrderedDict of counters and timings in seconds, added up across scans:
+        ``scans``, ``rows`` and ``batches`` produced, ``chunks`` read by the backend and the time spent
+        reading them (``parse_time`` for files, ``sql_execute_time`` and ``sql_fetch_time`` for
+        queries), ``bytes`` read from files when known, and ``columns``, the time spent in each added
+        column's function.
+        """
+        if self._stats is None:
+            return None
+        return self._stats.to_dict()
+
+    def _add_vectorized(self, chunk):
+        """Compute the vectorized added columns over a DataFrame chunk of source rows."""
+        if not self._columns_vectorized:
+            return chunk
+        chunk = chunk.copy()
+        for name, func in self.__functions.items():
+            if name in self._columns_vectorized:
+                chunk[name] = func(chunk)
+        return chunk
+
+    def __new_row_plan(self, names):
+        names = tuple(names)
+        columns_row = [(name, func) for name, func in self.__functions.items() if name not in self._columns_vectorized]
+        names_all = names + tuple(name for name, func in columns_row)
+        build_schema = Schema(names_all)
+        output_schema = Schema(names_all, visible=self._get_output_names(names_all))
+        return names, build_schema, output_schema, [func for name, func in columns_row], self._get_filters()[2]
+
+    def _new_row(self, schema, values):
+        # The plan is cached for the whole scan: rows of the same scan share their Schema.
+        plan = self.__row_plan
+        if plan is None or plan[0] is not schema:
+            if plan is None or tuple(schema) != plan[1]:
+                plan = (schema,) + self.__new_row_plan(schema)
+            else:
+                plan = (schema,) + plan[1:]
+            self.__row_plan = plan
+        _, names, build_schema, output_schema, funcs, row_filter = plan
+
+        values = list(values)
+        if funcs:
+            row = Row(build_schema, values)
+            start = len(values)
+            values.extend([None] * len(funcs))
+            for i, func in enumerate(funcs):
+                values[start + i] = func(row)
+            if row_filter is not None and not expr.evaluate(row_filter, row):
+                return None
+        return Row(output_schema, values)
 
     def _new_tuple(self, schema, values):
+        if self._row_type == 'compact':
+            return self._new_row(schema, values)
         attrs = collections.OrderedDict()
         for name, value in zip(schema, values):         # Build record
             attrs[name] = value
-        for name, func in self._columns_added.items():  # Add extra columns
-            attrs[name] = func(attrs)
+        for name, func in self.__functions.items():     # Add extra columns
+            if name not in self._columns_vectorized:
+                attrs[name] = func(attrs)
+        row_filter = self._get_filters()[2]             # Filter on added columns
+        if row_filter is not None and not expr.evaluate(row_filter, attrs):
+            return None
         for name in self._columns_hidden:               # Remove hidden columns
-            del attrs[name]
+            attrs.pop(name, None)
+        if self._columns_selected is not None:          # Keep selected columns
+            attrs = collections.OrderedDict((name, attrs[name]) for name in self._get_output_names(attrs.keys()))
         return attrs
 
+    def __filter_source(self, chunk, filters):
+        if not self.FILTER_PUSHDOWN:
+            chunk = self._filter_chunk(chunk, filters[0])
+        chunk = self._add_vectorized(chunk)
+        return self._filter_chunk(chunk, filters[1])
+
+    def _new_tuples(self, chunk):
+        """Iterate over the records of a DataFrame chunk of source rows.
+
+        Filters that do not use per-row added columns are applied to the whole chunk first.
+        """
+        chunk = self.__filter_source(chunk, self._get_filters())
+        schema = [str(name) for name in chunk.columns]
+        for values in chunk.values:
+            row = self._new_tuple(schema, values)
+            if row is not None:
+                yield row
+
+    def _new_batch(self, chunk, filter=None):
+        """Apply the filter, AND-ed with the `filter` expression, and the added and hidden columns
+        to a DataFrame chunk of source rows.
+        """
+        filters = self._get_filters(filter)
+        chunk = self.__filter_source(chunk, filters)
+        columns_row = [(name, func) for name, func in self.__functions.items() if name not in self._columns_vectorized]
+        if columns_row:
+            if not self._columns_vectorized:
+                chunk = chunk.copy()
+            names = [str(name) for name in chunk.columns]
+            values = collections.OrderedDict((name, []) for name, func in columns_row)
+            for row in chunk.values:
+                attrs = collections.OrderedDict(zip(names, row))
+                for name, func in columns_row:
+                    attrs[name] = func(attrs)
+                    values[name].append(attrs[name])
+            for name, column in values.items():
+                chunk[name] = column
+        chunk = self._filter_chunk(chunk, filters[2])
+        if self._columns_selected is not None:
+            chunk = chunk[self._get_output_names([str(name) for name in chunk.columns])]
+        else:
+            hidden = [name for name in chunk.columns if name in self._columns_hidden]
+            if hidden:
+                chunk = chunk.drop(hidden, axis=1)
+        return chunk
+
+    def _get_batches(self, batch_size, filter=None):
+        # Generic implementation over rows; backends override it to batch natively.
+        rows = []
+        for row in self._get_iterator():
+            rows.append(row)
+            if len(rows) == batch_size:
+                yield self._filter_chunk(pandas.DataFrame.from_records([row.values() for row in rows], columns=rows[0].keys()), filter)
+                rows = []
+        if rows:
+            yield self._filter_chunk(pandas.DataFrame.from_records([row.values() for row in rows], columns=rows[0].keys()), filter)
+
     def __iter__(self):
+        if self._stats is not None:
+            return self.__counted_rows(self._get_iterator())
         return self._get_iterator()
 
+    def iter_batches(self, batch_size=None, format='pandas', filter=None):
+        """Iterate over the table in batches of rows, without building one record per row.
+
+        :param batch_size: Maximum number of rows per batch. Defaults to the backend's chunk size.
+        :type batch_size: int
+        :param format: ``'pandas'`` to yield DataFrames or ``'numpy'`` to yield NumPy record arrays.
+        :type format: str
+        :param filter: Expression over the output columns restricting this iteration only. See :meth:`filter`.
+        :type filter: str
+        """
+        if format not in ('pandas', 'numpy'):
+            raise ValueError('format is not pandas or numpy')
+        if isinstance(filter, (str, unicode)):
+            filter = expr.parse(filter)
+        batches = self._get_batches(batch_size or self.CHUNK_SIZE, filter)
+        if self._stats is not None:
+            batches = self.__counted_batches(batches)
+        for batch in batches:
+            if format == 'numpy':
+                yield batch.to_records(index=False)
+            else:
+                yield batch
+
+    def __is_filtered(self):
+        """Whether rows are filtered after the backend has positioned them."""
+        source, chunk, row = self._get_filters()
+        return (source is not None and not self.FILTER_PUSHDOWN) or chunk is not None or row is not None
+
+    def __get_filtered_key(self, key):
+        if key < 0:
+            raise NotImplementedError('index backward not support')
+        for i, row in enumerate(self._get_iterator()):
+            if i == key:
+                return row
+        raise IndexError('index out of range')
+
+    def __get_filtered_slice(self, slice):
+        if slice.step:
+            raise NotImplementedError('slice step not supported')
+        start, stop = slice.start or 0, slice.stop
+        if stop is not None and stop < start:
+            raise NotImplementedError('slice backward not supported')
+        for i, row in enumerate(self._get_iterator()):
+            if stop is not None and i >= stop:
+                return
+            if i >= start:
+                yield row
+
+    def _get_fingerprint(self):
+        """Return a JSON-like value that changes whenever the table's rows may change."""
+        return self.to_json()
+
+    def _get_schema(self):
+        # Generic implementation over a sampled batch; backends override it to use their own metadata.
+        for batch in self._get_batches(self.SCHEMA_SAMPLE):
+            return get_batch_schema(batch)
+        return None
+
+    def schema(self):
+        """Return an OrderedDict of the column names and their Python types, or None if the table is empty.
+
+        Types are inferred from a sample of rows, ignoring nulls, and cached by the table's
+        definition and, for files, their size and modification time.
+        """
+        key = get_key(self._get_fingerprint())
+        if key not in Table._schemas:
+            if len(Table._schemas) >= Table.SCHEMAS_SIZE:
+                Table._schemas.clear()
+            Table._schemas[key] = self._get_schema()
+        schema = Table._schemas[key]
+        return None if schema is None else collections.OrderedDict(schema)
+
+    def _get_count(self):
+        # Generic implementation over batches; backends override it to count without parsing rows.
+        return sum(len(batch) for batch in self._get_batches(self.CHUNK_SIZE))
+
+    def count(self):
+        """Return the number of rows.
+
+        Backends count without building records where they can, e.g. from cached file statistics
+        or with a SQL count(*); filters evaluated in Python need a scan.
+        """
+        if self.__is_filtered():
+            return sum(len(batch) for batch in self._get_batches(self.CHUNK_SIZE))
+        return self._get_count()
+
     def __getitem__(self, key):
         if isinstance(key, (int, long)):
+            if self.__is_filtered():
+                return self.__get_filtered_key(key)
             return self._get_key(key)
         elif isinstance(key, slice):
+            if self.__is_filtered():
+                return self.__get_filtered_slice(key)
             return self._get_slice(key)
         elif isinstance(key, (str, unicode)):
             return self.__get_attribute(key)
@@ -96,14 +505,82 @@ class Table(object):
 
     def __setitem__(self, key, value):
         if isinstance(key, (str, unicode)) and hasattr(value, '__call__'):
-            self._columns_added[key] = value
+            self.add_column(key, value)
 
     def __delitem__(self, key):
         if isinstance(key, (str, unicode)):
             if key in self._columns_added:
                 del self._columns_added[key]
+                self._columns_vectorized.discard(key)
+                self._columns_inputs.pop(key, None)
             else:
                 self._columns_hidden.add(key)
+            self._reset_plans()
+
+    def select(self, *columns):
+        """Restrict the table, in place, to the given columns and return it.
+
+        Only the source columns needed by the selection, including the declared inputs of selected
+        added columns, are read by the backends that support it.
+
+        Usage example:
+
+        >>> resource.select('name', 'total')
+
+        """
+        self._columns_selected = list(columns)
+        self._reset_plans()
+        return self
+
+    def filter(self, expression):
+        """Keep, in place, only the rows matching `expression`, and return the table.
+
+        Successive filters are AND-ed. Conditions over source columns are evaluated as masks
+        over whole chunks before records are built, or by the backend itself (e.g. SQL).
+
+        :param expression: Comparisons (``=``, ``!=``, ``<``, ...), ``AND``, ``OR``, ``NOT``,
+            ``IN (...)`` and ``IS [NOT] NULL`` over column names and literals.
+        :type expression: str
+
+        Usage example:
+
+        >>> resource.filter("price > 10 AND (country IN ('CH', 'FR') OR region IS NULL)")
+
+        """
+        self._filter = expr.conjunction(expr.conjuncts(self._filter) + expr.conjuncts(expr.parse(expression)))
+        self._reset_plans()
+        return self
+
+    def add_column(self, name, func, vectorized=False, inputs=None):
+        """Add a column computed from the other columns.
+
+        :param name: The column name.
+        :type name: str or unicode
+        :param func: Function computing the column. It receives each record and returns a value or,
+            if `vectorized`, receives each chunk of rows as a DataFrame and returns an array.
+        :param vectorized: Whether `func` operates on whole chunks. Vectorized columns are computed
+            before the other added columns, so they can only use source columns and earlier
+            vectorized columns.
+        :type vectorized: bool
+        :param inputs: Names of the columns used by `func`. Declaring them lets a projection skip
+            reading the other columns.
+        :type inputs: list
+
+        Usage example:
+
+        >>> resource.add_column('total', lambda chunk: chunk['price'] * chunk['quantity'], vectorized=True)
+
+        """
+        self._columns_added[name] = func
+        if vectorized:
+            self._columns_vectorized.add(name)
+        else:
+            self._columns_vectorized.discard(name)
+        if inputs is not None:
+            self._columns_inputs[name] = list(inputs)
+        else:
+            self._columns_inputs.pop(name, None)
+        self._reset_plans()
 
     def keys(self):
         return self._get_keys()
@@ -121,8 +598,10 @@ class Table(object):
     def __get_attribute(self, name):
         if name in self._columns_hidden:
             raise KeyError('column %s hidden' % name)
+        if self._columns_selected is not None and name not in self._columns_selected:
+            raise KeyError('column %s not selected' % name)
 
-        if name in self._columns_added:
+        if name in self._columns_added or self._filter is not None:
             # This is a slow but needed since the user's code can depend on other columns.
             return self.__get_added_attribute(name)
         else:
@@ -131,6 +610,8 @@ class Table(object):
     def _repr_html_(self):
         """Pretty print for IPython Notebook.
         """
+        import prettytable
+
         pretty = None
         n = 0
         for row in self._get_iterator():
@@ -153,10 +634,13 @@ class Table(object):
     def pandas_dataframe(self):
         """Return a Pandas DataFrame.
         """
-        data = {}
-        for name in self._get_keys():
-            data[name] = list(self.__get_attribute(name))
-        return pandas.DataFrame(data)
+        batches = self._get_batches(self.CHUNK_SIZE)
+        if self._stats is not None:
+            batches = self.__counted_batches(batches)
+        batches = list(batches)
+        if not batches:
+            return pandas.DataFrame()
+        return pandas.concat(batches, ignore_index=True)
 
     def plot(self, *args, **kwargs):
         """Return a plot (from Pandas Dataframe).
@@ -26,6 +26,8 @@
 #
 import collections
 
+from .row import Row
+
 
 name_types = (str, unicode)
 primitive_types = (int, long, float, str, unicode, bool)
@@ -56,7 +58,7 @@ def is_table(data):
         except StopIteration:
             return None
         else:
-            if isinstance(item, collections.OrderedDict) \
+            if isinstance(item, (collections.OrderedDict, Row)) \
                 and all([isinstance(k, name_types) for k in item.keys()]):
                 schema = collections.OrderedDict()
                 for k, v in item.items():
@@ -79,3 +81,62 @@ def is_table(data):
             return None
     except TypeError:
         return None
+
+def get_values_type(values):
+    """Return the primitive type of a column from its sampled values, ignoring nulls.
+
+    Columns mixing integers and floats are floats; columns without values are str.
+    """
+    types = set()
+    for v in values:
+        if v is None or (isinstance(v, float) and v != v):
+            continue
+        try:
+            types.add(get_primitive_type(v))
+        except TypeError:
+            types.add(str)
+    if not types:
+        return str
+    if types <= set([int, long]):
+        return long if long in types else int
+    if types <= set([int, long, float]):
+        return float
+    if types <= set([str, unicode]):
+        return unicode if unicode in types else str
+    if len(types) == 1:
+        return types.pop()
+    return str
+
+def get_batch_schema(batch):
+    """Return the column types of a DataFrame batch of sampled rows."""
+    schema = collections.OrderedDict()
+    for name, dtype in batch.dtypes.iteritems():
+        column = batch[name]
+        if dtype.kind in 'iu':
+            schema[str(name)] = int if not len(column) or -2 ** 31 <= column.min() and column.max() < 2 ** 31 else long
+        elif dtype.kind == 'f':
+            schema[str(name)] = float
+        elif dtype.kind == 'b':
+            schema[str(name)] = bool
+        elif dtype.kind == 'O':
+            schema[str(name)] = get_values_type(column.tolist())
+        else:
+            schema[str(name)] = str
+    return schema
+
+def merge_schemas(schemas):
+    """Return the schema of rows from tables with the given schemas, widening conflicting types."""
+    merged = collections.OrderedDict()
+    for schema in schemas:
+        for name, t in schema.items():
+            if name not in merged or merged[name] == t:
+                merged[name] = t
+            elif set([merged[name], t]) <= set([int, long]):
+                merged[name] = long
+            elif set([merged[name], t]) <= set([int, long, float]):
+                merged[name] = float
+            elif set([merged[name], t]) <= set([str, unicode]):
+                merged[name] = unicode
+            else:
+                merged[name] = str
+    return merged
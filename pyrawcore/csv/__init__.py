@@ -27,11 +27,15 @@
 from .csv import Csv
 
 
-def csv(path, **args):
+def csv(path, cache=False, parallel=None, **args):
     """Creates a query-able RAW resource from a CSV file.
 
     :param path: The CSV file path.
     :type path: str or unicode
+    :param cache: Keep a memory-mapped binary copy of the parsed columns, written by the first full scan, so that later scans do not re-parse the file.
+    :type cache: bool
+    :param parallel: Parse full scans on a pool of processes, one per core or as set by the ``workers`` option of the ``csv`` configuration section: ``'ordered'`` yields rows in file order, ``'unordered'`` as soon as each range of rows is parsed.
+    :type parallel: str
     :param args: Arguments to pass to the internal (Pandas-based) file parser. Accepts all arguments in `pandas.read_csv <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.io.parsers.read_csv.html>`_.
 
     Usage example:
@@ -39,7 +43,7 @@ def csv(path, **args):
     >>> resource = csv('/home/john/data.xlsx')
 
     """
-    return Csv(path, args=args)
+    return Csv(path, args=args, cache=cache, parallel=parallel)
 
 
 def load(payload):
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import collections
+import os
+import shutil
+import uuid
+
+import numpy
+import pandas
+from ..core.cache import get_cache_path, get_file_stamp, get_key, read_json, write_json
+
+
+class UnsupportedColumn(Exception):
+    pass
+
+
+def encode_column(values):
+    """Return (dtype, mask, data) for a chunk column, where `data` is a fixed-width array.
+
+    Strings are stored as fixed-width byte or unicode arrays and missing values in a
+    separate mask, so that every column can be memory-mapped back without parsing.
+    """
+    if values.dtype.kind in 'biufcmM':
+        return values.dtype, None, values
+    if values.dtype.kind != 'O':
+        raise UnsupportedColumn(values.dtype)
+
+    mask = pandas.isnull(values)
+    items = values[~mask]
+    if not all(isinstance(v, basestring) for v in items):
+        raise UnsupportedColumn('mixed object column')
+    kind = 'U' if any(isinstance(v, unicode) for v in items) else 'S'
+    filled = values.copy()
+    filled[mask] = ''
+    data = numpy.array(filled.tolist(), dtype=kind)
+    return numpy.dtype(object), mask.astype(numpy.uint8), data
+
+
+class ColumnCache(object):
+    """Memory-mapped, per-column binary copy of the chunks parsed from a CSV file.
+
+    Each column is stored in its own file as the concatenation of its chunk arrays; the
+    chunk layout is kept in `meta.json`. Caches are kept in a directory per file path and
+    parser arguments, keyed by the file's size and modification time, so a modified file
+    gets a fresh cache and the stale ones are found and removed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.columns = meta['columns']
+        self.chunks = meta['chunks']
+        self.__buffers = {}
+
+    @staticmethod
+    def get_path(path, args):
+        return os.path.join(
+            get_cache_path('csv_columns'),
+            get_key(os.path.realpath(path), args),
+            get_key(get_file_stamp(path)))
+
+    @staticmethod
+    def open(path, args):
+        """Return the cache for the CSV file, or None if it has not been written yet."""
+        cache_path = ColumnCache.get_path(path, args)
+        meta = read_json(os.path.join(cache_path, 'meta.json'))
+        if not meta or meta.get('version') != ColumnCache.VERSION:
+            return None
+        return ColumnCache(cache_path, meta)
+
+    def __buffer(self, i):
+        if i not in self.__buffers:
+            filename = os.path.join(self.path, '%d.data' % i)
+            if os.path.getsize(filename):
+                self.__buffers[i] = numpy.memmap(filename, dtype=numpy.uint8, mode='r')
+            else:
+                self.__buffers[i] = numpy.zeros(0, dtype=numpy.uint8)
+        return self.__buffers[i]
+
+    def __read_column(self, i, column, rows, start, stop):
+        buf = self.__buffer(i)
+        data = numpy.frombuffer(buf, dtype=numpy.dtype(column['data']), count=rows, offset=column['offset'])
+        data = data[start:stop]
+        if column['dtype'] != 'object':
+            return data
+        mask = numpy.frombuffer(buf, dtype=numpy.uint8, count=rows, offset=column['mask'])
+        values = data.astype(object)
+        values[mask[start:stop].astype(bool)] = numpy.nan
+        return values
+
+    def read_chunks(self, start=0, stop=None, usecols=None, chunksize=None):
+        """Iterate over the cached chunks as DataFrames, from row `start` to row `stop`.
+
+        Chunks longer than `chunksize` rows are split.
+        """
+        columns = [(i, name) for i, name in enumerate(self.columns) if usecols is None or name in usecols]
+        offset = 0
+        for chunk in self.chunks:
+            rows = chunk['rows']
+            if stop is not None and offset >= stop:
+                return
+            if offset + rows > start:
+                lo = max(start - offset, 0)
+                hi = rows if stop is None else min(stop - offset, rows)
+                step = chunksize or hi - lo
+                while lo < hi:
+                    data = collections.OrderedDict()
+                    for i, name in columns:
+                        data[name] = self.__read_column(i, chunk['columns'][i], rows, lo, min(lo + step, hi))
+                    yield pandas.DataFrame(data, columns=[name for i, name in columns])
+                    lo += step
+            offset += rows
+
+
+class ColumnCacheWriter(object):
+    """Writes the chunks of a full scan to a new `ColumnCache`, published atomically on commit."""
+
+    def __init__(self, path, args):
+        self.cache_path = ColumnCache.get_path(path, args)
+        self.tmp_path = '%s.%s.tmp' % (self.cache_path, uuid.uuid4().hex)
+        self.columns = None
+        self.chunks = []
+        self.files = []
+        self.sizes = []
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+
+    def write(self, chunk):
+        columns = [str(name) for name in chunk.columns]
+        if self.columns is None:
+            self.columns = columns
+            self.files = [open(os.path.join(self.tmp_path, '%d.data' % i), 'wb') for i in range(len(columns))]
+            self.sizes = [0] * len(columns)
+        elif columns != self.columns:
+            raise UnsupportedColumn('incompatible chunk schema')
+
+        meta = []
+        for i, name in enumerate(columns):
+            dtype, mask, data = encode_column(chunk[chunk.columns[i]].values)
+            column = dict(dtype=str(dtype), data=data.dtype.str)
+            column['offset'] = self.__append(i, data)
+            if mask is not None:
+                column['mask'] = self.__append(i, mask)
+            meta.append(column)
+        self.chunks.append(dict(rows=len(chunk), columns=meta))
+
+    def __append(self, i, data):
+        offset = self.sizes[i]
+        buf = numpy.ascontiguousarray(data).tobytes()
+        self.files[i].write(buf)
+        self.sizes[i] += len(buf)
+        return offset
+
+    def __close(self):
+        for f in self.files:
+            f.close()
+        self.files = []
+
+    def commit(self):
+        self.__close()
+        try:
+            write_json(os.path.join(self.tmp_path, 'meta.json'), dict(
+                version=ColumnCache.VERSION,
+                columns=self.columns or [],
+                chunks=self.chunks))
+            os.rename(self.tmp_path, self.cache_path)
+        except (IOError, OSError):
+            # Another writer published the same cache first, or a newer one removed this one
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+        self.__remove_stale()
+
+    def __remove_stale(self):
+        """Remove the caches, finished or not, written for older versions of the file."""
+        parent, name = os.path.split(self.cache_path)
+        for sibling in os.listdir(parent):
+            if not sibling.startswith(name):
+                shutil.rmtree(os.path.join(parent, sibling), ignore_errors=True)
+
+    def abort(self):
+        self.__close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
@@ -24,26 +24,41 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
-import collections
 import os
 
 import pandas
-from ..core import get_option, Table
+from ..core import get_option, Setting, Table
+from ..core.cache import get_file_stamp
+from ..core.tablify import get_batch_schema
+from .cache import ColumnCache, ColumnCacheWriter, UnsupportedColumn
+from .index import count_rows, is_indexable, RowIndex
+from .parallel import get_ranges, get_workers, scan
 
 
-def get_chunk_schema(chunk):
-    schema = collections.OrderedDict()
-    for name in chunk.columns:
-        schema[str(name)] = chunk[name].dtype
-    return schema
+def get_slice_range(slice):
+    if slice.step:
+        raise NotImplementedError('slice step not supported')
 
+    start, stop = slice.start, slice.stop
 
-base_path = get_option('files', 'base_path')
+    if not start:
+        start = 0
+
+    if stop is not None and stop < start:
+        raise NotImplementedError('slice backward not supported')
+
+    return start, stop
 
 
 class Csv(Table):
 
-    CHUNK_SIZE = 10000
+    CHUNK_SIZE = Setting('csv', 'chunk_size', 10000)
+
+    # Rows between checkpoints of the sparse row index used for random access.
+    INDEX_STEP = Setting('csv', 'index_step', 1000)
+
+    # Full scans on one process, or on a process pool yielding chunks in file order or as parsed.
+    PARALLEL_MODES = (None, 'ordered', 'unordered')
 
     class Column(object):
 
@@ -52,15 +67,7 @@ class Csv(Table):
             self.column = column
 
         def __iter__(self):
-            schema = None
-            for chunk in pandas.read_csv(self.parent._get_path(), chunksize=self.parent.CHUNK_SIZE, usecols=[self.column], **self.parent.args):
-
-                chunk_schema = get_chunk_schema(chunk)
-                if not schema:
-                    schema = chunk_schema
-                #elif schema != chunk_schema:
-                #    raise RuntimeError('incompatible chunk schema')
-
+            for chunk in self.parent._read_chunks(usecols=[self.column]):
                 for row in chunk.values:
                     yield row[0]
 
@@ -68,60 +75,15 @@ class Csv(Table):
             if key < 0:
                 raise NotImplementedError('index backward not support')
 
-            schema = None
-            for chunk in pandas.read_csv(self.parent._get_path(), chunksize=self.parent.CHUNK_SIZE, usecols=[self.column], **self.parent.args):
-
-                chunk_schema = get_chunk_schema(chunk)
-                if not schema:
-                    schema = chunk_schema
-                #elif schema != chunk_schema:
-                #    raise RuntimeError('incompatible chunk schema')
-
-                if key < self.parent.CHUNK_SIZE:
-                    try:
-                        return chunk.values[key][0]
-                    except IndexError:
-                        # Replace Pandas error message since it is confusing
-                        raise IndexError('index out of range')
-                else:
-                    key -= self.parent.CHUNK_SIZE
+            for chunk in self.parent._read_chunks(start=key, stop=key + 1, usecols=[self.column]):
+                return chunk.values[0][0]
             raise IndexError('index out of range')
 
         def __get_slice(self, slice):
-            if slice.step:
-                raise NotImplementedError('slice step not supported')
-
-            start, stop = slice.start, slice.stop
-
-            if not start:
-                start = 0
-
-            if stop is not None and stop < start:
-                raise NotImplementedError('slice backward not supported')
-
-            schema = None
-            for chunk in pandas.read_csv(self.parent._get_path(), chunksize=self.parent.CHUNK_SIZE, usecols=[self.column], **self.parent.args):
-
-                chunk_schema = get_chunk_schema(chunk)
-                if not schema:
-                    schema = chunk_schema
-                #elif schema != chunk_schema:
-                #    raise RuntimeError('incompatible chunk schema')
-
-                if start < self.parent.CHUNK_SIZE and stop is not None and stop < self.parent.CHUNK_SIZE:
-                    for row in chunk.values[start:stop]:
-                        yield row[0]
-                    return
-                elif start < self.parent.CHUNK_SIZE:
-                    for row in chunk.values[start:]:
-                        yield row[0]
-                    start = 0
-                    if stop is not None:
-                        stop -= self.parent.CHUNK_SIZE
-                else:
-                    start -= self.parent.CHUNK_SIZE
-                    if stop is not None:
-                        stop -= self.parent.CHUNK_SIZE
+            start, stop = get_slice_range(slice)
+            for chunk in self.parent._read_chunks(start=start, stop=stop, usecols=[self.column]):
+                for row in chunk.values:
+                    yield row[0]
 
         def __getitem__(self, key):
             if isinstance(key, (int, long)):
@@ -130,24 +92,156 @@ class Csv(Table):
                 return self.__get_slice(key)
             raise ValueError('key is not an int, long or slice')
 
-    def __init__(self, path, args, columns_added=[], columns_hidden=[]):
-        super(Csv, self).__init__(columns_added=columns_added, columns_hidden=columns_hidden)
+    def __init__(self, path, args, cache=False, parallel=None, **kwargs):
+        super(Csv, self).__init__(**kwargs)
         # TODO: Validate path, args, ...
+        if parallel not in Csv.PARALLEL_MODES:
+            raise ValueError('parallel is not ordered or unordered')
         self.path = path
         self.args = args
+        self.cache = cache
+        self.parallel = parallel
 
     def _get_path(self):
+        base_path = get_option('files', 'base_path')
         if base_path:
             return os.path.join(base_path, self.path)
         return self.path
 
+    def _get_index(self):
+        """Return the sparse row index, or None if the parser arguments do not allow one."""
+        if not is_indexable(self.args):
+            return None
+        return RowIndex.get(self._get_path(), self.args, self.INDEX_STEP)
+
+    def _get_header(self):
+        """Return the names of all the columns in the file, including those left out by `usecols`."""
+        args = {key: value for key, value in self.args.items() if key != 'usecols'}
+        return [str(name) for name in pandas.read_csv(self._get_path(), nrows=0, **args).columns]
+
+    def _get_usecols(self):
+        """Return the columns to parse, or None to parse all of them."""
+        if 'usecols' in self.args or (self._columns_selected is None and not self._columns_hidden):
+            return None
+        return self._get_projection(self._get_header())
+
+    def _read_chunks(self, start=0, stop=None, chunksize=None, usecols=None):
+        return self._timed_chunks(self.__select_chunks(start, stop, chunksize, usecols))
+
+    def __select_chunks(self, start=0, stop=None, chunksize=None, usecols=None):
+        """Iterate over the file in chunks, starting at row `start` and ending before row `stop`.
+
+        With `cache` enabled, chunks come from the memory-mapped column cache, which the first
+        full scan writes. Otherwise, row positions past the first checkpoint are reached through
+        the sparse row index when available, so only the rows after the nearest checkpoint are parsed,
+        and full scans run on a process pool if `parallel` is set.
+        """
+        chunksize = chunksize or self.CHUNK_SIZE
+        full = not start and stop is None
+        if not self.cache:
+            return self._scan(chunksize, usecols) if full else self._parse_chunks(start, stop, chunksize, usecols)
+
+        cache = ColumnCache.open(self._get_path(), self.args)
+        if cache is not None:
+            return cache.read_chunks(start, stop, usecols=usecols, chunksize=chunksize)
+        if not full:
+            return self._parse_chunks(start, stop, chunksize, usecols)
+        if usecols is not None:
+            return self._scan(chunksize, usecols)
+        return self._write_cache(chunksize)
+
+    def _scan(self, chunksize, usecols=None, ordered=None):
+        """Parse the whole file, in parallel if `parallel` is set and the file can be indexed."""
+        if self._stats is not None:
+            self._stats.add('bytes', os.path.getsize(self._get_path()))
+        index = self._get_index() if self.parallel else None
+        if not index or not index.rows:
+            return self._parse_chunks(chunksize=chunksize, usecols=usecols)
+        if ordered is None:
+            ordered = self.parallel == 'ordered'
+        return self._scan_parallel(index, chunksize, usecols, ordered)
+
+    def _scan_parallel(self, index, chunksize, usecols, ordered):
+        # Workers start mid-file, so they get the header as column names.
+        args = dict(self.args)
+        args['names'] = self._get_header()
+        args['header'] = None
+        if usecols is not None:
+            args['usecols'] = usecols
+        ranges = get_ranges(index, chunksize)
+        for chunk in scan(self._get_path(), args, ranges, get_workers(), ordered=ordered):
+            for start in range(0, len(chunk), chunksize):
+                yield chunk.iloc[start:start + chunksize]
+
+    def _write_cache(self, chunksize):
+        """Parse the whole file, writing each chunk to a new column cache as it is yielded."""
+        writer = ColumnCacheWriter(self._get_path(), self.args)
+        try:
+            for chunk in self._scan(chunksize, ordered=True):
+                if writer is not None:
+                    try:
+                        writer.write(chunk)
+                    except UnsupportedColumn:
+                        writer.abort()
+                        writer = None
+                yield chunk
+        except:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.commit()
+
+    def _parse_chunks(self, start=0, stop=None, chunksize=None, usecols=None):
+        args = dict(self.args)
+        if usecols is not None:
+            args['usecols'] = usecols
+        path = self._get_path()
+        f = None
+        skip = start
+        index = self._get_index() if start >= self.INDEX_STEP else None
+        if index is not None:
+            if start >= index.rows:
+                return
+            offset, skip = index.seek(start)
+            args['names'] = self._get_header()
+            args['header'] = None
+            f = open(path, 'rb')
+            f.seek(offset)
+
+        args['chunksize'] = chunksize or self.CHUNK_SIZE
+        if stop is not None:
+            args['chunksize'] = max(1, min(args['chunksize'], skip + stop - start))
+
+        remaining = None if stop is None else stop - start
+        try:
+            for chunk in pandas.read_csv(f or path, **args):
+                if skip:
+                    if skip >= len(chunk):
+                        skip -= len(chunk)
+                        continue
+                    chunk = chunk.iloc[skip:]
+                    skip = 0
+                if remaining is not None:
+                    if remaining <= 0:
+                        return
+                    chunk = chunk.iloc[:remaining]
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            if f is not None:
+                if self._stats is not None:
+                    self._stats.add('bytes', f.tell() - offset)
+                f.close()
+
     @staticmethod
     def from_json(payload):
         return Csv(
             payload['path'],
             args=payload['args'],
-            columns_added=Table._decode_columns_added(payload),
-            columns_hidden=Table._decode_columns_hidden(payload))
+            cache=payload.get('cache', False),
+            parallel=payload.get('parallel'),
+            **Table._decode_options(payload))
 
     def to_json(self):
         return dict(
@@ -155,21 +249,18 @@ class Csv(Table):
             payload=dict(
                 path=self.path,
                 args=self.args,
-                columns_added=self._encode_columns_added(),
-                columns_hidden=self._encode_columns_hidden()))
+                cache=self.cache,
+                parallel=self.parallel,
+                **self._encode_options()))
 
     def _get_iterator(self):
-        schema = None
-        for chunk in pandas.read_csv(self._get_path(), chunksize=self.CHUNK_SIZE, **self.args):
-
-            chunk_schema = get_chunk_schema(chunk)
-            if not schema:
-                schema = chunk_schema
-            #elif schema != chunk_schema:
-            #    raise RuntimeError('incompatible chunk schema')
+        for chunk in self._read_chunks(usecols=self._get_usecols()):
+            for row in self._new_tuples(chunk):
+                yield row
 
-            for row in chunk.values:
-                yield self._new_tuple(schema, row)
+    def _get_batches(self, batch_size, filter=None):
+        for chunk in self._read_chunks(chunksize=batch_size, usecols=self._get_usecols()):
+            yield self._new_batch(chunk, filter)
 
     def _get_keys(self):
         try:
@@ -183,60 +274,33 @@ class Csv(Table):
         if key < 0:
             raise NotImplementedError('index backward not support')
 
-        schema = None
-        for chunk in pandas.read_csv(self._get_path(), chunksize=self.CHUNK_SIZE, **self.args):
-
-            chunk_schema = get_chunk_schema(chunk)
-            if not schema:
-                schema = chunk_schema
-            #elif schema != chunk_schema:
-            #    raise RuntimeError('incompatible chunk schema')
-
-            if key < self.CHUNK_SIZE:
-                try:
-                    return self._new_tuple(schema, chunk.values[key])
-                except IndexError:
-                    # Replace Pandas error message since it is confusing
-                    raise IndexError('index out of range')
-            else:
-                key -= self.CHUNK_SIZE
+        for chunk in self._read_chunks(start=key, stop=key + 1, usecols=self._get_usecols()):
+            return next(self._new_tuples(chunk))
         raise IndexError('index out of range')
 
     def _get_slice(self, slice):
-        if slice.step:
-            raise NotImplementedError('slice step not supported')
-
-        start, stop = slice.start, slice.stop
-
-        if not start:
-            start = 0
-
-        if stop is not None and stop < start:
-            raise NotImplementedError('slice backward not supported')
-
-        schema = None
-        for chunk in pandas.read_csv(self._get_path(), chunksize=self.CHUNK_SIZE, **self.args):
-
-            chunk_schema = get_chunk_schema(chunk)
-            if not schema:
-                schema = chunk_schema
-            #elif schema != chunk_schema:
-            #    raise RuntimeError('incompatible chunk schema')
-
-            if start < self.CHUNK_SIZE and stop is not None and stop < self.CHUNK_SIZE:
-                for row in chunk.values[start:stop]:
-                    yield self._new_tuple(schema, row)
-                return
-            elif start < self.CHUNK_SIZE:
-                for row in chunk.values[start:]:
-                    yield self._new_tuple(schema, row)
-                start = 0
-                if stop is not None:
-                    stop -= self.CHUNK_SIZE
-            else:
-                start -= self.CHUNK_SIZE
-                if stop is not None:
-                    stop -= self.CHUNK_SIZE
+        start, stop = get_slice_range(slice)
+
+        for chunk in self._read_chunks(start=start, stop=stop, usecols=self._get_usecols()):
+            for row in self._new_tuples(chunk):
+                yield row
+
+    def _get_fingerprint(self):
+        return dict(table=self.to_json(), stamp=get_file_stamp(self._get_path()))
+
+    def _get_schema(self):
+        n = self.SCHEMA_SAMPLE
+        for chunk in self._read_chunks(stop=n, chunksize=n, usecols=self._get_usecols()):
+            return get_batch_schema(self._new_batch(chunk))
+        return None
+
+    def _get_count(self):
+        if is_indexable(self.args):
+            return count_rows(self._get_path(), self.args, self.INDEX_STEP)
+        cache = ColumnCache.open(self._get_path(), self.args) if self.cache else None
+        if cache is not None:
+            return sum(chunk['rows'] for chunk in cache.chunks)
+        return sum(len(chunk) for chunk in self._read_chunks(usecols=[0]))
 
     def _get_column(self, name):
         return Csv.Column(self, name)
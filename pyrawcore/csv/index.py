@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import mmap
+import os
+
+from ..core.cache import get_cache_path, get_file_stamp, get_key, read_json, write_json
+
+
+# Arguments that change how records map to rows; files read with any of these are not indexed.
+UNSAFE_ARGS = (
+    'chunksize',
+    'comment',
+    'delim_whitespace',
+    'doublequote',
+    'escapechar',
+    'header',
+    'index_col',
+    'iterator',
+    'lineterminator',
+    'nrows',
+    'quoting',
+    'skip_blank_lines',
+    'skip_footer',
+    'skipfooter',
+    'skiprows',
+)
+
+def is_indexable(args):
+    if any(name in args for name in UNSAFE_ARGS):
+        return False
+    encoding = (args.get('encoding') or '').lower().replace('-', '').replace('_', '')
+    return not encoding.startswith(('utf16', 'utf32'))
+
+
+class RowIndex(object):
+    """Sparse index of row number to byte offset for a CSV file.
+
+    A checkpoint holds the offset of every `step`-th data row, so a lookup seeks to the
+    nearest checkpoint and parses at most `step` rows. Indexes are persisted in the cache
+    directory and rebuilt whenever the file size or modification time changes.
+    """
+
+    VERSION = 1
+
+    def __init__(self, stamp, step, rows, offsets):
+        self.stamp = stamp
+        self.step = step
+        self.rows = rows
+        self.offsets = offsets
+
+    def seek(self, row):
+        """Return the byte offset of the checkpoint at or before `row`, and the rows to skip from there."""
+        if row >= self.rows:
+            raise IndexError('index out of range')
+        checkpoint = row // self.step
+        return self.offsets[checkpoint], row - checkpoint * self.step
+
+    @staticmethod
+    def build(path, stamp, step, quotechar='"', header_rows=1):
+        """Scan the file once, tracking quotes so that embedded newlines do not start new rows."""
+        offsets = []
+        rows = 0
+        offset = 0
+        in_quote = False
+        with open(path, 'rb') as f:
+            for line in f:
+                if not in_quote and line not in ('\n', '\r\n'):  # Blank lines are skipped like Pandas does
+                    if header_rows:
+                        header_rows -= 1
+                    else:
+                        if rows % step == 0:
+                            offsets.append(offset)
+                        rows += 1
+                if quotechar in line and line.count(quotechar) % 2:
+                    in_quote = not in_quote
+                offset += len(line)
+        return RowIndex(stamp, step, rows, offsets)
+
+    @staticmethod
+    def get(path, args, step):
+        """Return an up-to-date index for the CSV file, loading or building it as needed."""
+        stamp = list(get_file_stamp(path))
+        quotechar = args.get('quotechar', '"')
+        header_rows = 0 if 'names' in args else 1
+        index_path = os.path.join(
+            get_cache_path('csv_index'),
+            get_key(os.path.realpath(path), quotechar, header_rows, step))
+
+        data = read_json(index_path)
+        if data and data.get('version') == RowIndex.VERSION and data['stamp'] == stamp:
+            return RowIndex(stamp, data['step'], data['rows'], data['offsets'])
+
+        index = RowIndex.build(path, stamp, step, quotechar=quotechar, header_rows=header_rows)
+        write_json(index_path, dict(
+            version=RowIndex.VERSION,
+            stamp=index.stamp,
+            step=index.step,
+            rows=index.rows,
+            offsets=index.offsets))
+        return index
+
+
+def count_lines(path, quotechar='"'):
+    """Count the lines of a file over a memory map, 16 MB at a time.
+
+    Returns None if the file contains quote characters or blank lines, whose rows cannot be
+    told from its lines without tracking quotes.
+    """
+    block = 16 * 1024 * 1024
+    lines = 0
+    last = '\n'
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return 0
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for start in range(0, len(data), block):
+                chunk = data[start:start + block]
+                if quotechar in chunk or '\n\n' in last + chunk or '\n\r\n' in last + chunk:
+                    return None
+                lines += chunk.count('\n')
+                last = chunk[-2:]
+        finally:
+            data.close()
+    if not last.endswith('\n'):
+        lines += 1  # Last line without a line break
+    return lines
+
+
+def count_rows(path, args, step):
+    """Return the number of data rows of the CSV file.
+
+    Files without quotes or blank lines are counted by line, and the count is cached by file size
+    and modification time. Other files are counted by the quote-aware scan of the row index,
+    which is cached in turn.
+    """
+    stamp = list(get_file_stamp(path))
+    quotechar = args.get('quotechar', '"')
+    header_rows = 0 if 'names' in args else 1
+    count_path = os.path.join(get_cache_path('csv_count'), get_key(os.path.realpath(path), quotechar, header_rows))
+
+    data = read_json(count_path)
+    if data and data['stamp'] == stamp:
+        return data['rows']
+
+    lines = count_lines(path, quotechar)
+    if lines is None:
+        return RowIndex.get(path, args, step).rows
+    rows = max(0, lines - header_rows)
+    write_json(count_path, dict(stamp=stamp, rows=rows))
+    return rows
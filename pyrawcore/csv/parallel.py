@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import collections
+import multiprocessing
+
+import pandas
+
+from ..core import get_int_option
+
+
+def get_workers(workers=None):
+    """Return the number of worker processes: `workers`, the 'csv'/'workers' option, or one per core."""
+    workers = workers or get_int_option('csv', 'workers')
+    if workers:
+        return max(1, workers)
+    return multiprocessing.cpu_count()
+
+
+def get_ranges(index, rows):
+    """Split the rows of an indexed file into ranges of about `rows` rows starting at index checkpoints.
+
+    Checkpoints are byte offsets of row starts found by a quote-aware scan, so a range never begins
+    inside a quoted field that spans several lines.
+    """
+    steps = max(1, rows // index.step)
+    ranges = []
+    for checkpoint in range(0, len(index.offsets), steps):
+        first = checkpoint * index.step
+        ranges.append((index.offsets[checkpoint], min(steps * index.step, index.rows - first)))
+    return ranges
+
+
+def parse_range(task):
+    """Parse `nrows` rows starting at byte `offset`. Runs in the worker processes."""
+    path, args, offset, nrows = task
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return pandas.read_csv(f, nrows=nrows, **args)
+
+
+def get_ready(pending):
+    """Remove and return the first finished result of `pending`, waiting for one if none is."""
+    while True:
+        for i, result in enumerate(pending):
+            if result.ready():
+                del pending[i]
+                return result
+        pending[0].wait(0.01)
+
+
+def scan(path, args, ranges, workers, ordered=True, window=None):
+    """Parse the byte ranges in a pool of `workers` processes, yielding one DataFrame per range.
+
+    Unordered scans yield each range as soon as it is parsed. At most `window` ranges, twice
+    the number of workers by default, are submitted and not yet yielded, so a slow consumer
+    does not let parsed ranges pile up in memory.
+    """
+    tasks = collections.deque((path, args, offset, nrows) for offset, nrows in ranges)
+    workers = min(workers, len(tasks)) or 1
+    window = window or 2 * workers
+    pool = multiprocessing.Pool(workers)
+    try:
+        pending = collections.deque()
+        while tasks or pending:
+            while tasks and len(pending) < window:
+                pending.append(pool.apply_async(parse_range, (tasks.popleft(),)))
+            result = pending.popleft() if ordered else get_ready(pending)
+            yield result.get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
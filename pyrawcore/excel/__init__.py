@@ -27,11 +27,15 @@
 from .excel import Excel
 
 
-def excel(path, **args):
+def excel(path, stream=False, **args):
     """Creates a query-able RAW resource from an Excel file.
 
+    Parsed sheets are kept in an in-process cache, bounded by the ``cache_size`` option (in megabytes, 256 by default) of the ``excel`` configuration section, so that repeated reads of an unchanged file do not parse it again.
+
     :param path: The Excel file path.
     :type path: str or unicode
+    :param stream: Read rows incrementally, in chunks, instead of parsing the whole sheet first. Only the ``sheetname``, ``header`` and ``names`` arguments are supported while streaming; sheets read with other arguments are parsed whole.
+    :type stream: bool
     :param args: Arguments to pass to the internal (Pandas-based) file parser. Accepts all arguments in `pandas.read_excel <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.io.excel.read_excel.html>`_.
 
     Usage example:
@@ -42,7 +46,7 @@ def excel(path, **args):
     if 'sheetname' not in args:
         args['sheetname'] = 0
 
-    return Excel(path, args=args)
+    return Excel(path, args=args, stream=stream)
 
 
 def load(payload):
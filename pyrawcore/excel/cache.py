@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import collections
+import os
+import threading
+
+import pandas
+from ..core import get_float_option
+from ..core.cache import get_file_stamp, get_key
+
+
+class SheetCache(object):
+    """In-process LRU cache of parsed sheets.
+
+    Sheets are keyed by file path, size, modification time and parser arguments, so a changed
+    file is parsed again. The least recently used sheets are evicted once the total size of
+    the cached DataFrames exceeds `budget` bytes. Cached DataFrames are shared: callers must
+    not modify them. Without a `budget`, it is read from the configuration on first use.
+    """
+
+    def __init__(self, budget=None):
+        self.__budget = budget
+        self.size = 0
+        self.__sheets = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    @property
+    def budget(self):
+        if self.__budget is None:
+            # Memory budget, in megabytes, of the parsed sheets kept by each process; 0 disables the cache.
+            self.__budget = int(get_float_option('excel', 'cache_size', 256) * 1024 * 1024)
+        return self.__budget
+
+    def get(self, key):
+        with self.__lock:
+            entry = self.__sheets.pop(key, None)
+            if entry is None:
+                return None
+            self.__sheets[key] = entry
+            return entry[0]
+
+    def put(self, key, data):
+        size = int(data.memory_usage(index=True, deep=True).sum())
+        if size > self.budget:
+            return
+        with self.__lock:
+            entry = self.__sheets.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+            while self.__sheets and self.size + size > self.budget:
+                _, (_, evicted) = self.__sheets.popitem(last=False)
+                self.size -= evicted
+            self.__sheets[key] = (data, size)
+            self.size += size
+
+    def clear(self):
+        with self.__lock:
+            self.__sheets.clear()
+            self.size = 0
+
+
+sheets = SheetCache()
+
+
+def read_excel(path, args):
+    """Return the sheet parsed by `pandas.read_excel(path, **args)`, from the cache when possible."""
+    key = get_key(os.path.realpath(path), get_file_stamp(path), args)
+    data = sheets.get(key)
+    if data is None:
+        data = pandas.read_excel(path, **args)
+        sheets.put(key, data)
+    return data
@@ -24,22 +24,16 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
-import collections
 import os
 
 import pandas
 from ..core import get_option, Table
+from ..core.cache import get_file_stamp
+from ..core.tablify import get_batch_schema
+from .cache import read_excel
+from .reader import count_rows, is_streamable, iter_chunks
 
 
-def get_chunk_schema(chunk):
-    schema = collections.OrderedDict()
-    for name in chunk.columns:
-        schema[str(name)] = chunk[name].dtype
-    return schema
-
-
-base_path = get_option('files', 'base_path')
-
 
 class Excel(Table):
 
@@ -50,7 +44,7 @@ class Excel(Table):
             self.column = column
 
         def __iter__(self):
-            data = pandas.read_excel(self.parent._get_path(), parse_cols=[self.column], **self.parent.args)
+            data = read_excel(self.parent._get_path(), dict(self.parent.args, parse_cols=[self.column]))
             for row in data.values:
                 yield row[0]
 
@@ -58,7 +52,7 @@ class Excel(Table):
             if key < 0:
                 raise NotImplementedError('index backward not support')
 
-            data = pandas.read_excel(self.parent._get_path(), parse_cols=[self.column], **self.parent.args)
+            data = read_excel(self.parent._get_path(), dict(self.parent.args, parse_cols=[self.column]))
             return data.values[key][0]
 
         def __get_slice(self, slice):
@@ -73,7 +67,7 @@ class Excel(Table):
             if stop is not None and stop < start:
                 raise NotImplementedError('slice backward not supported')
 
-            data = pandas.read_excel(self.parent._get_path(), parse_cols=[self.column], **self.parent.args)
+            data = read_excel(self.parent._get_path(), dict(self.parent.args, parse_cols=[self.column]))
             for row in data.values[start:stop]:
                 yield row[0]
 
@@ -84,24 +78,74 @@ class Excel(Table):
                 return self.__get_slice(key)
             raise ValueError('key is not an int, long or slice')    
 
-    def __init__(self, path, args, columns_added=[], columns_hidden=[]):
-        super(Excel, self).__init__(columns_added=columns_added, columns_hidden=columns_hidden)
+    def __init__(self, path, args, stream=False, **kwargs):
+        super(Excel, self).__init__(**kwargs)
         # TODO: Validate path, args, ...
         self.path = path
         self.args = args
+        self.stream = stream
+        self.__header = None
 
     def _get_path(self):
+        base_path = get_option('files', 'base_path')
         if base_path:
             return os.path.join(base_path, self.path)
         return self.path
 
+    def __read(self):
+        """Read the sheet, parsing only the needed columns once the header is known.
+
+        Parsed sheets are shared through the process' sheet cache and must not be modified.
+        """
+        if self._stats is None:
+            return self.__read_sheet()
+        with self._stats.timer('parse_time'):
+            data = self.__read_sheet()
+        self._stats.add('chunks')
+        return data
+
+    def __read_sheet(self):
+        path = self._get_path()
+        args = dict(self.args)
+        stamp = get_file_stamp(path)
+        projected = (self._columns_selected is not None or self._columns_hidden) \
+            and not any(name in args for name in ('index_col', 'parse_cols', 'usecols'))
+
+        if projected and self.__header and self.__header[0] == stamp:
+            names = self.__header[1]
+            needed = self._get_projection(names)
+            if needed is not None:
+                args['parse_cols'] = [names.index(name) for name in needed]
+            return read_excel(path, args)
+
+        data = read_excel(path, args)
+        if projected:
+            # Remember the column positions so that the next reads only parse the needed columns
+            names = [str(name) for name in data.columns]
+            self.__header = (stamp, names)
+            needed = self._get_projection(names)
+            if needed is not None:
+                data = data[needed]
+        return data
+
+    def __is_streamed(self):
+        return self.stream and is_streamable(self.args)
+
+    def __read_chunks(self, start=0, stop=None, chunksize=None):
+        """Read rows `start` to `stop` of the sheet incrementally, in chunks of at most `chunksize` rows."""
+        project = None
+        if self._columns_selected is not None or self._columns_hidden:
+            project = self._get_projection
+        return self._timed_chunks(
+            iter_chunks(self._get_path(), self.args, chunksize or self.CHUNK_SIZE, start, stop, project))
+
     @staticmethod
     def from_json(payload):
         return Excel(
             payload['path'],
             args=payload['args'],
-            columns_added=Table._decode_columns_added(payload),
-            columns_hidden=Table._decode_columns_hidden(payload))
+            stream=payload.get('stream', False),
+            **Table._decode_options(payload))
 
     def to_json(self):
         return dict(
@@ -109,14 +153,27 @@ class Excel(Table):
             payload=dict(
                 path=self.path,
                 args=self.args,
-                columns_added=self._encode_columns_added(),
-                columns_hidden=self._encode_columns_hidden()))
+                stream=self.stream,
+                **self._encode_options()))
 
     def _get_iterator(self):
-        data = pandas.read_excel(self._get_path(), **self.args)
-        schema = get_chunk_schema(data)
-        for row in data.values:
-            yield self._new_tuple(schema, row)    
+        if self.__is_streamed():
+            for chunk in self.__read_chunks():
+                for row in self._new_tuples(chunk):
+                    yield row
+            return
+        data = self.__read()
+        for row in self._new_tuples(data):
+            yield row
+
+    def _get_batches(self, batch_size, filter=None):
+        if self.__is_streamed():
+            for chunk in self.__read_chunks(chunksize=batch_size):
+                yield self._new_batch(chunk, filter)
+            return
+        data = self.__read()
+        for start in range(0, len(data), batch_size):
+            yield self._new_batch(data.iloc[start:start + batch_size].copy(), filter)
 
     def _get_keys(self):
         try:
@@ -130,9 +187,14 @@ class Excel(Table):
         if key < 0:
             raise NotImplementedError('index backward not support')
 
-        data = pandas.read_excel(self._get_path(), **self.args)
-        schema = get_chunk_schema(data)
-        return self._new_tuple(schema, data.values[key])
+        if self.__is_streamed():
+            for chunk in self.__read_chunks(key, key + 1):
+                return next(self._new_tuples(chunk))
+            raise IndexError('index out of range')
+        data = self.__read()
+        if key >= len(data):
+            raise IndexError('index out of range')
+        return next(self._new_tuples(data.iloc[key:key + 1]))
 
     def _get_slice(self, slice):
         if slice.step:
@@ -145,11 +207,34 @@ class Excel(Table):
 
         if stop is not None and stop < start:
             raise NotImplementedError('slice backward not supported')
-        
-        data = pandas.read_excel(self._get_path(), **self.args)
-        schema = get_chunk_schema(data)
-        for row in data.values[start:stop]:
-            yield self.new_tuple(schema, row)
+
+        if self.__is_streamed():
+            for chunk in self.__read_chunks(start, stop):
+                for row in self._new_tuples(chunk):
+                    yield row
+            return
+        data = self.__read()
+        for row in self._new_tuples(data.iloc[start:stop]):
+            yield row
+
+    def _get_fingerprint(self):
+        return dict(table=self.to_json(), stamp=get_file_stamp(self._get_path()))
+
+    def _get_schema(self):
+        n = self.SCHEMA_SAMPLE
+        if self.__is_streamed():
+            chunks = list(self.__read_chunks(stop=n, chunksize=n))
+            chunk = chunks[0] if chunks else None
+        else:
+            chunk = pandas.read_excel(self._get_path(), nrows=n, **self.args)
+        if chunk is None or not len(chunk):
+            return None
+        return get_batch_schema(self._new_batch(chunk))
+
+    def _get_count(self):
+        if self.__is_streamed():
+            return count_rows(self._get_path(), self.args)
+        return len(self.__read())
 
     def _get_column(self, name):
         raise NotImplementedError('Panda read_excel.parse_cols not working')
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import pandas
+
+
+# Parser arguments the streaming reader understands; other arguments need pandas.read_excel.
+STREAM_ARGS = ('sheetname', 'sheet_name', 'header', 'names')
+
+def is_streamable(args):
+    return all(name in STREAM_ARGS for name in args) and args.get('header', 0) in (0, None)
+
+
+def iter_xls_rows(path, sheet):
+    """Yield the rows of an .xls sheet, loading only that sheet."""
+    import xlrd
+    book = xlrd.open_workbook(path, on_demand=True)
+    try:
+        if isinstance(sheet, (int, long)):
+            sheet = book.sheet_by_index(sheet)
+        else:
+            sheet = book.sheet_by_name(sheet)
+        for i in range(sheet.nrows):
+            row = []
+            for kind, value in zip(sheet.row_types(i), sheet.row_values(i)):
+                if kind in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                    value = None
+                elif kind == xlrd.XL_CELL_DATE:
+                    value = xlrd.xldate.xldate_as_datetime(value, book.datemode)
+                elif kind == xlrd.XL_CELL_BOOLEAN:
+                    value = bool(value)
+                elif kind == xlrd.XL_CELL_NUMBER and value == int(value):
+                    value = int(value)  # Like pandas.read_excel(convert_float=True)
+                row.append(value)
+            yield row
+    finally:
+        book.release_resources()
+
+def iter_xlsx_rows(path, sheet):
+    """Yield the rows of an .xlsx sheet, reading the file incrementally."""
+    import openpyxl
+    book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet, (int, long)):
+            sheet = book.worksheets[sheet]
+        else:
+            sheet = book[sheet]
+        for row in sheet.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        book.close()
+
+def iter_rows(path, args):
+    """Yield the rows of the sheet selected by `args` as lists of values."""
+    sheet = args.get('sheet_name', args.get('sheetname', 0))
+    if path.lower().endswith('.xls'):
+        return iter_xls_rows(path, sheet)
+    return iter_xlsx_rows(path, sheet)
+
+
+def count_rows(path, args):
+    """Return the number of rows of the sheet without converting them to DataFrames.
+
+    Trailing blank rows are not counted, like iter_chunks() and pandas.read_excel do.
+    """
+    rows = iter_rows(path, args)
+    try:
+        if args.get('header', 0) == 0:
+            next(rows, None)
+        n = 0
+        for i, row in enumerate(rows):
+            if not all(value is None for value in row):
+                n = i + 1
+        return n
+    finally:
+        rows.close()
+
+
+def get_width(path, args):
+    """Return the number of cells of the widest row, the columns pandas.read_excel names 0, 1, ...
+    when the sheet has no header.
+    """
+    rows = iter_rows(path, args)
+    try:
+        return max([len(row) for row in rows] or [0])
+    finally:
+        rows.close()
+
+
+def iter_chunks(path, args, chunksize, start=0, stop=None, project=None):
+    """Iterate over the sheet in DataFrame chunks of rows `start` to `stop`, like `Csv` does.
+
+    Rows before `start` are skipped without being converted and reading stops at `stop`.
+    `project` receives the column names and returns those to keep, or None to keep all of them.
+    Trailing blank rows are skipped like pandas.read_excel does; other blank rows are rows of nulls.
+    """
+    rows = iter_rows(path, args)
+    try:
+        names = args.get('names')
+        if args.get('header', 0) == 0:
+            header = next(rows, [])
+            if names is None:
+                names = [u'Unnamed: %d' % i if name is None else name for i, name in enumerate(header)]
+        if names is None:
+            names = range(get_width(path, args))
+        names = list(names)
+        needed = project([str(name) for name in names]) if project else None
+        positions = range(len(names)) if needed is None else [[str(name) for name in names].index(name) for name in needed]
+        columns = [names[i] for i in positions]
+
+        chunk = []
+        n = 0
+        blanks = 0
+        for row in rows:
+            if all(value is None for value in row):
+                blanks += 1  # Kept only if a non-blank row follows
+                continue
+            for row in [[None] * len(names) for _ in range(blanks)] + [row]:
+                if stop is not None and n >= stop:
+                    break
+                n += 1
+                if n <= start:
+                    continue
+                row.extend([None] * (len(names) - len(row)))
+                chunk.append([row[i] for i in positions])
+                if len(chunk) == chunksize:
+                    yield pandas.DataFrame.from_records(chunk, columns=columns)
+                    chunk = []
+            blanks = 0
+            if stop is not None and n >= stop:
+                break
+        if chunk:
+            yield pandas.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        rows.close()
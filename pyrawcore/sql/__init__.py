@@ -24,14 +24,30 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
+from ..core import get_int_option, get_option
 from .sql import SQL
+from .sqlite import get_input_size, SQLite
 
 
-def sql(query, **tables):
+def get_engine(tables):
+    """Choose SQLite if the inputs are files totalling at most the 'sql'/'sqlite_max_size' option
+    (in bytes, 64 MB by default), and PostgreSQL otherwise.
+    """
+    sizes = [get_input_size(table) for table in tables.values()]
+    if None not in sizes and sum(sizes) <= get_int_option('sql', 'sqlite_max_size', 64 * 1024 * 1024):
+        return 'sqlite'
+    return 'postgres'
+
+
+def sql(query, materialize=False, engine=None, **tables):
     """Creates a SQL query resource.
 
     :param query: SQL query.
     :type query: str or unicode
+    :param materialize: Store the query results in a table, numbered and indexed by row, the first time rows are accessed by position, so that later keys and slices do not run the query again. The table is a snapshot, dropped with the resource.
+    :type materialize: bool
+    :param engine: ``'postgres'`` to run the query on the PostgreSQL server, ``'sqlite'`` to load the tables into an embedded SQLite database and run it in process, or ``'auto'`` to choose SQLite for small input files. Defaults to the ``engine`` option of the ``sql`` configuration section, or ``'postgres'``. `materialize` needs PostgreSQL: ``'auto'`` then always chooses it, and ``'sqlite'`` raises ValueError.
+    :type engine: str
     :param args: Arguments mapping table name to Resource instances. See usage example below.
 
     Usage example:
@@ -52,10 +68,21 @@ def sql(query, **tables):
     [(3L, 4L)]
 
     """
-    return SQL(query, tables)
+    engine = engine or get_option('sql', 'engine', 'postgres')
+    if engine == 'auto':
+        engine = 'postgres' if materialize else get_engine(tables)
+    if engine == 'sqlite':
+        if materialize:
+            raise ValueError('materialize is not supported by the sqlite engine')
+        return SQLite(query, tables)
+    elif engine == 'postgres':
+        return SQL(query, tables, materialize=materialize)
+    raise ValueError('engine is not postgres, sqlite or auto')
 
 
 def load(payload):
+    if payload.get('engine') == 'sqlite':
+        return SQLite.from_json(payload)
     return SQL.from_json(payload)
 
 __all__ = ['sql', 'load']
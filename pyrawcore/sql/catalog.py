@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import contextlib
+import os
+import tempfile
+
+from ..core import get_int_option, get_option
+from ..core.cache import write_json
+from .pool import connection
+
+
+# Key of the advisory lock serializing catalog changes across processes.
+LOCK_KEY = 0x7261775f636174  # 'raw_cat'
+
+
+def get_resource_path():
+    """Return the directory holding the resource files read by the foreign data wrapper."""
+    path = get_option('sql', 'resource_path')
+    if not path:
+        path = os.path.realpath(tempfile.gettempdir())
+    return path
+
+
+def get_catalog_schema():
+    return get_option('sql', 'catalog_schema', 'pyrawcore_catalog')
+
+
+@contextlib.contextmanager
+def transaction():
+    """Borrow a connection and run a transaction holding the catalog lock, creating the catalog if needed."""
+    schema = get_catalog_schema()
+    with connection() as conn:
+        conn.autocommit = False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%d)" % LOCK_KEY)
+                cur.execute("CREATE SCHEMA IF NOT EXISTS %s" % schema)
+                cur.execute("CREATE TABLE IF NOT EXISTS %s.entries "
+                            "(key TEXT PRIMARY KEY, refs INTEGER NOT NULL, last_used TIMESTAMP WITH TIME ZONE NOT NULL)" % schema)
+                yield cur
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+
+
+def acquire(key, payload, create):
+    """Return the foreign table for the resource identified by `key`, counting a new reference to it.
+
+    Foreign tables are shared by all resources with the same content-addressed `key`. The first
+    reference writes `payload` as the resource file read by the foreign data wrapper and calls
+    `create(cursor, table)` to create the table.
+    """
+    table = '%s.t_%s' % (get_catalog_schema(), key)
+    path = os.path.join(get_resource_path(), key)
+    with transaction() as cur:
+        if not os.path.exists(path):
+            write_json(path, payload)
+            # If the PostgreSQL instance is not running in the current account,
+            # make the resource file readable by all users.
+            #if not postgres_running_in_user_account:
+            #    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        cur.execute("SELECT refs FROM %s.entries WHERE key = %%s" % get_catalog_schema(), (key,))
+        if cur.fetchone() is None:
+            create(cur, table)
+            cur.execute("INSERT INTO %s.entries (key, refs, last_used) VALUES (%%s, 1, now())" % get_catalog_schema(),
+                        (key,))
+        else:
+            cur.execute("UPDATE %s.entries SET refs = refs + 1, last_used = now() WHERE key = %%s" % get_catalog_schema(),
+                        (key,))
+    return table
+
+
+def release(keys):
+    """Drop a reference for each of the `keys`, counting repeated keys (e.g. self-joins) once
+    per occurrence, then collect unused tables.
+    """
+    with transaction() as cur:
+        cur.execute("UPDATE %s.entries AS e SET refs = e.refs - r.n, last_used = now() "
+                    "FROM (SELECT key, count(*) AS n FROM unnest(%%s::text[]) AS key GROUP BY key) AS r "
+                    "WHERE e.key = r.key" % get_catalog_schema(),
+                    (list(keys),))
+        collect(cur)
+
+
+def collect(cur):
+    """Drop the foreign tables, and their resource files, unreferenced for longer than the
+    'sql'/'catalog_ttl' option (in seconds, one hour by default).
+    """
+    schema = get_catalog_schema()
+    ttl = get_int_option('sql', 'catalog_ttl', 3600)
+    cur.execute("SELECT key FROM %s.entries WHERE refs <= 0 AND last_used < now() - interval '%d seconds'" % (schema, ttl))
+    for key, in cur.fetchall():
+        cur.execute("DROP FOREIGN TABLE IF EXISTS %s.t_%s CASCADE" % (schema, key))
+        cur.execute("DELETE FROM %s.entries WHERE key = %%s" % schema, (key,))
+        try:
+            os.remove(os.path.join(get_resource_path(), key))
+        except OSError:
+            pass
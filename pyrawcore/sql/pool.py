@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import contextlib
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.pool
+from ..core import get_float_option, get_int_option, get_option
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of autocommit connections to the PostgreSQL server.
+
+    At most `maxconn` connections are lent at once; borrowers wait up to `timeout` seconds for
+    one to be returned, then get a PoolError. Up to `minconn` idle connections are kept open.
+    Connections idle for more than `check_interval` seconds are checked with a trivial query
+    before being lent, and broken connections are replaced.
+    """
+
+    def __init__(self, dsn, minconn, maxconn, check_interval, timeout=30):
+        self.pid = os.getpid()
+        self.maxconn = maxconn
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.__pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, dsn)
+        self.__available = maxconn
+        self.__slots = threading.Condition()
+        self.__returned = {}
+
+    def __acquire(self):
+        deadline = time.time() + self.timeout
+        with self.__slots:
+            while not self.__available:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise psycopg2.pool.PoolError(
+                        'no connection returned within %g seconds, all %d are in use' % (self.timeout, self.maxconn))
+                self.__slots.wait(remaining)
+            self.__available -= 1
+
+    def __release(self):
+        with self.__slots:
+            self.__available += 1
+            self.__slots.notify()
+
+    def __is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.time() - self.__returned.get(id(conn), 0) < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        self.__acquire()
+        try:
+            while True:
+                conn = self.__pool.getconn()
+                if self.__is_healthy(conn):
+                    conn.autocommit = True
+                    return conn
+                self.__pool.putconn(conn, close=True)
+        except:
+            self.__release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            self.__returned[id(conn)] = time.time()
+            self.__pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.__release()
+
+    def closeall(self):
+        self.__pool.closeall()
+
+
+_pool = None
+_lock = threading.Lock()
+# Pools inherited from a parent process. Their sockets belong to the parent, so they are kept
+# referenced, and never closed, by the child.
+_inherited = []
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it as configured in the 'sql' section."""
+    global _pool
+    with _lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(
+                get_option('sql', 'connection_string'),
+                get_int_option('sql', 'pool_min', 1),
+                get_int_option('sql', 'pool_max', 8),
+                get_float_option('sql', 'pool_check_interval', 30),
+                get_float_option('sql', 'pool_timeout', 30))
+        return _pool
+
+
+@contextlib.contextmanager
+def connection(schema=None):
+    """Borrow a connection from the pool, with `schema` first in the search path if given."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            if schema:
+                cur.execute("SET search_path TO %s, public" % schema)
+            else:
+                cur.execute("RESET search_path")
+        yield conn
+    finally:
+        pool.putconn(conn)
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import numpy
+import pandas
+from ..core import expr, load, Table
+
+
+def fetchmany(cur, size):
+    """Iterate over the results of an executed cursor in lists of at most `size` tuples."""
+    rows = cur.fetchmany(size)
+    while rows:
+        yield rows
+        rows = cur.fetchmany(size)
+
+
+def get_column_array(values, dtype):
+    """Return the column values as an array of `dtype`, falling back to floats or objects for
+    integer or boolean columns with nulls.
+    """
+    if None in values:
+        kind = numpy.dtype(dtype).kind
+        if kind in 'iuf':
+            return numpy.array([numpy.nan if value is None else value for value in values], dtype=numpy.float64)
+        if kind == 'b':
+            return numpy.array(values, dtype=object)
+    return numpy.array(values, dtype=dtype)
+
+
+class Query(Table):
+    """SQL query over named tables, shared by the database engines.
+
+    Engines run the queries built here through `_get_chunks`, `_get_description` and `_get_scalar`.
+    """
+
+    ENGINE = None
+    FILTER_PUSHDOWN = True
+
+    # LIMIT value for no limit, as OFFSET may require a LIMIT.
+    NO_LIMIT = 'ALL'
+
+    class Column(object):
+
+        def __init__(self, parent, column):
+            self.parent = parent
+            self.column = column
+
+        def iter_batches(self, batch_size=None):
+            """Iterate over the column in NumPy arrays typed after the result column."""
+            return self.parent._get_column_batches(self.column, batch_size=batch_size)
+
+        def numpy_array(self):
+            """Return the column as one NumPy array typed after the result column."""
+            return numpy.concatenate(list(self.iter_batches()))
+
+        def __iter__(self):
+            for batch in self.iter_batches():
+                for value in batch.tolist():
+                    yield value
+
+        def __get_key(self, key):
+            if key < 0:
+                raise NotImplementedError('index backward not support')
+
+            batches = self.parent._get_column_batches(self.column, key, key + 1)
+            try:
+                batch = next(batches)
+            finally:
+                batches.close()
+            if not len(batch):
+                raise IndexError('index out of range')
+            return batch.tolist()[0]
+
+        def __get_slice(self, slice):
+            if slice.step:
+                raise NotImplementedError('slice step not supported')
+
+            start, stop = slice.start or 0, slice.stop
+
+            if stop is not None and stop < start:
+                raise NotImplementedError('slice backward not supported')
+
+            for batch in self.parent._get_column_batches(self.column, start, stop):
+                for value in batch.tolist():
+                    yield value
+
+        def __getitem__(self, key):
+            if isinstance(key, (int, long)):
+                return self.__get_key(key)
+            elif isinstance(key, slice):
+                return self.__get_slice(key)
+            raise ValueError('key is not an int, long or slice')
+
+    def __init__(self, sql, tables, **kwargs):
+        super(Query, self).__init__(**kwargs)
+        # TODO: Validate sql statement
+        for name, resource in tables.items():
+            if not isinstance(name, (str, unicode)):
+                raise ValueError('table name is not a str or unicode')
+            if not hasattr(resource, 'to_json'):
+                raise ValueError('table resource is not serializable')
+        self.sql = sql
+        self.tables = tables
+        self.__names = None
+        self.__counts = {}
+        self.__dtypes = {}
+
+    @staticmethod
+    def _decode_tables(payload):
+        return {table_name: load(table_json) for table_name, table_json in payload['tables'].items()}
+
+    def _encode_query_options(self):
+        """Return the engine's options to serialize with the query."""
+        return {}
+
+    def to_json(self):
+        payload = dict(
+            sql=self.sql,
+            tables={table_name: table_resource.to_json() for table_name, table_resource in self.tables.items()},
+            engine=self.ENGINE,
+            **self._encode_options())
+        payload.update(self._encode_query_options())
+        return dict(name='sql', payload=payload)
+
+    def _get_chunks(self, query, size=None):
+        """Execute `query` and iterate over its result column names and lists of at most `size` rows."""
+        raise NotImplementedError('Query._get_chunks()')
+
+    def _get_description(self, query):
+        """Return the result columns of `query` as (name, type) pairs."""
+        raise NotImplementedError('Query._get_description()')
+
+    def _get_scalar(self, query):
+        """Return the first value of the first result row of `query`."""
+        raise NotImplementedError('Query._get_scalar()')
+
+    def _get_dtypes(self, query):
+        """Return the NumPy types of the result columns of `query` by name, for engines that report them."""
+        return {}
+
+    def _fetch(self, cur, size):
+        return self._timed_chunks(fetchmany(cur, size), 'sql_fetch_time')
+
+    def _get_names(self):
+        if self.__names is None:
+            self.__names = [name for name, oid in self._get_description(self.sql)]
+        return self.__names
+
+    def _get_query(self, filter=None):
+        """Return the query, restricted to the columns needed to produce the output and to the
+        rows matching the filter conditions over its columns.
+        """
+        where = self._get_filters(filter)[0]
+        needed = None
+        if self._columns_selected is not None or self._columns_hidden:
+            needed = self._get_projection(self._get_names())
+        if needed is None and where is None:
+            return self.sql
+        columns = '*' if needed is None else ', '.join(expr.quote_name(name) for name in needed)
+        sql = "SELECT %s FROM (%s) AS t" % (columns, self.sql)
+        if where is not None:
+            sql += " WHERE %s" % expr.to_sql(where)
+        return sql
+
+    def _get_range_query(self, start, stop):
+        """Return the query for the result rows from `start` to `stop`."""
+        limit = self.NO_LIMIT if stop is None else stop - start
+        return "SELECT * FROM (%s) AS t LIMIT %s OFFSET %d" % (self._get_query(), limit, start)
+
+    def _get_count_query(self, query):
+        return "SELECT count(*) FROM (%s) AS t" % query
+
+    def _get_rows(self, query):
+        for names, rows in self._get_chunks(query):
+            if self._columns_vectorized:
+                for row in self._new_tuples(pandas.DataFrame.from_records(rows, columns=names)):
+                    yield row
+            else:
+                for values in rows:
+                    row = self._new_tuple(names, values)
+                    if row is not None:
+                        yield row
+
+    def _get_iterator(self):
+        return self._get_rows(self._get_query())
+
+    def _get_batches(self, batch_size, filter=None):
+        for names, rows in self._get_chunks(self._get_query(filter), batch_size):
+            yield self._new_batch(pandas.DataFrame.from_records(rows, columns=names), filter)
+
+    def _get_keys(self):
+        raise NotImplementedError('%s._get_keys()' % type(self).__name__)
+
+    def _get_key(self, key):
+        if key < 0:
+            raise NotImplementedError('index backward not support')
+
+        for row in self._get_rows(self._get_range_query(key, key + 1)):
+            return row
+        raise IndexError('index out of range')
+
+    def _get_slice(self, slice):
+        if slice.step:
+            raise NotImplementedError('slice step not supported')
+
+        start, stop = slice.start or 0, slice.stop
+
+        if stop is not None and stop < start:
+            raise NotImplementedError('slice backward not supported')
+
+        for row in self._get_rows(self._get_range_query(start, stop)):
+            yield row
+
+    def _get_fingerprint(self):
+        return dict(
+            table=self.to_json(),
+            tables={name: resource._get_fingerprint() for name, resource in self.tables.items()})
+
+    def _get_count(self):
+        """Count the result rows with count(*), once per query: the input tables do not change,
+        and a table's rows are also counted when it is converted to a list.
+        """
+        query = self._get_query()
+        if query not in self.__counts:
+            self.__counts[query] = self._get_scalar(self._get_count_query(query))
+        return self.__counts[query]
+
+    def _get_column_batches(self, name, start=0, stop=None, batch_size=None):
+        """Iterate over a result column, from row `start` to row `stop`, in NumPy arrays typed
+        after the result column, or after the first fetched values if the engine has no types.
+        """
+        query = self._get_query()
+        if query not in self.__dtypes:
+            self.__dtypes[query] = self._get_dtypes(query)
+        dtype = self.__dtypes[query].get(name)
+        query = "SELECT %s FROM (%s) AS t" % (expr.quote_name(name), query)
+        if start or stop is not None:
+            query += " LIMIT %s OFFSET %d" % (self.NO_LIMIT if stop is None else stop - start, start)
+        empty = True
+        for names, rows in self._get_chunks(query, batch_size or self.CHUNK_SIZE):
+            values = [row[0] for row in rows]
+            if dtype is None:
+                dtype = pandas.Series(values).dtype
+                if dtype.kind not in 'biuf':
+                    dtype = object
+            yield get_column_array(values, dtype)
+            empty = False
+        if empty:
+            yield numpy.array([], dtype=object if dtype is None else dtype)
+
+    def _get_column(self, name):
+        return Query.Column(self, name)
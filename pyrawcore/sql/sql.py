@@ -26,31 +26,33 @@
 #
 
 # TODO: If table contains > MAX fields, create table with columns referenced in query only.
-#       Hash set of columns referenced in query and used that as the PostgreSQL table id,
-#       to reuse the same table in future queries that reference the same subset of columns.
+#       Foreign tables are shared through the catalog by hashing the resource and its columns,
+#       so such tables would be reused by future queries that reference the same subset of columns.
 #       Disadvantage of hashing is that it disallows reusing tables with all needed columns
 #       but which also have a few extra.
 
 import collections
-import json
-import os
+import contextlib
+import tempfile
 import uuid
 
+import numpy
 import pandas
-import psycopg2
-import psycopg2.extras
-from ..core import get_option, load, Table, is_table
+from ..core import expr, Setting
+from ..core.cache import get_key
+from ..core.tablify import get_batch_schema
+from . import catalog
+from .pool import connection
+from .query import Query
 
 
-resource_path = get_option('sql', 'resource_path')
-if not resource_path:
-    import tempfile
-    resource_path = os.path.realpath(tempfile.gettempdir())
-
-
-class SQL(Table):
+class SQL(Query):
     
-    CHUNK_SIZE = 100000
+    ENGINE = 'postgres'
+    CHUNK_SIZE = Setting('sql', 'chunk_size', 100000)
+
+    # Rows fetched per round trip by the server-side cursors.
+    ITERSIZE = Setting('sql', 'itersize', 2000)
 
     TypesMap = {
         int: 'INTEGER',
@@ -61,68 +63,109 @@ class SQL(Table):
         bool: 'BOOLEAN'
     }
 
-    def __init__(self, sql, tables, columns_added=[], columns_hidden=[]):
-        super(SQL, self).__init__(columns_added=columns_added, columns_hidden=columns_hidden)
-        # TODO: Validate sql statement
-        for name, resource in tables.items():
-            if not isinstance(name, (str, unicode)):
-                raise ValueError('table name is not a str or unicode')
-            if not hasattr(resource, 'to_json'):
-                raise ValueError('table resource is not serializable')
-        self.sql = sql
-        self.tables = tables
-
-        self.__connect()
+    # Result type OIDs that need converting when parsing COPY output: text types are kept as
+    # strings instead of being inferred, booleans arrive as 't' and 'f'.
+    TextOids = (18, 25, 1042, 1043)  # char, text, bpchar, varchar
+    DateOids = (1082, 1114, 1184)    # date, timestamp, timestamptz
+    BoolOid = 16
+
+    # Python types of result columns by type OID, for schemas.
+    PythonTypesMap = {
+        16: bool,
+        20: long,
+        21: int,
+        23: int,
+        700: float,
+        701: float,
+        1700: float,
+        18: str,
+        25: str,
+        1042: str,
+        1043: str,
+    }
+
+    # NumPy types of result columns by type OID; other types are kept as Python objects.
+    DtypesMap = {
+        16: numpy.bool_,                # bool
+        20: numpy.int64,                # int8
+        21: numpy.int16,                # int2
+        23: numpy.int32,                # int4
+        700: numpy.float32,             # float4
+        701: numpy.float64,             # float8
+        1700: numpy.float64,            # numeric
+        1082: numpy.dtype('M8[D]'),     # date
+        1114: numpy.dtype('M8[us]'),    # timestamp
+    }
+
+    def __init__(self, sql, tables, materialize=False, **kwargs):
+        self.__schema = None
+        self.__keys = []
+        super(SQL, self).__init__(sql, tables, **kwargs)
+        self.materialize = materialize
+        self.__materialized = {}
+
         self.__create_schema()
         self.__create_tables()
 
     def __del__(self):
-        self.__drop_schema()
-        self.__disconnect()
+        if self.__schema is not None:
+            self.__drop_schema()
+        if self.__keys:
+            catalog.release(self.__keys)
 
     @staticmethod
     def from_json(payload):
         return SQL(
             payload['sql'],
-            {table_name: load(table_json) for table_name, table_json in payload['tables'].items()},
-            columns_added=Table._decode_columns_added(payload),
-            columns_hidden=Table._decode_columns_hidden(payload))
-
-    def to_json(self):
-        return dict(
-            name='sql',
-            payload=dict(
-                sql=self.sql,
-                tables={table_name: table_resource.to_json() for table_name, table_resource in self.tables.items()},
-                columns_added=self._encode_columns_added(),
-                columns_hidden=self._encode_columns_hidden()))
-
-    def __connect(self):
-        self.__conn = psycopg2.connect(get_option('sql', 'connection_string'))
-        self.__conn.set_isolation_level(0)
-
-    def __disconnect(self):
-        self.__conn.close()
+            Query._decode_tables(payload),
+            materialize=payload.get('materialize', False),
+            **Query._decode_options(payload))
+
+    def _encode_query_options(self):
+        return dict(materialize=self.materialize)
+
+    @contextlib.contextmanager
+    def __cursor(self, *args, **kwargs):
+        """Borrow a pooled connection with the resource's schema in the search path, and open a cursor on it."""
+        with connection(self.__schema) as conn:
+            with conn.cursor(*args, **kwargs) as cur:
+                yield cur
+
+    @contextlib.contextmanager
+    def __server_cursor(self):
+        """Borrow a pooled connection and open a named cursor on it, which streams results from the
+        server instead of fetching them all on execute().
+        """
+        with connection(self.__schema) as conn:
+            conn.autocommit = False  # Named cursors only live within a transaction
+            try:
+                with conn.cursor('cursor_%s' % uuid.uuid4().hex) as cur:
+                    cur.itersize = self.ITERSIZE
+                    yield cur
+            finally:
+                if not conn.closed:
+                    conn.rollback()
 
     def __create_schema(self):
-        self.__schema = 'schema_%s' % str(uuid.uuid4()).replace('-', '')
-        with self.__conn.cursor() as cur:
-            cur.execute("CREATE SCHEMA %s" % self.__schema)
-            cur.execute("SET search_path to %s, public" % self.__schema)
+        schema = 'schema_%s' % str(uuid.uuid4()).replace('-', '')
+        with connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE SCHEMA %s" % schema)
+        self.__schema = schema
 
     def __drop_schema(self):
-        with self.__conn.cursor() as cur:
-            cur.execute("DROP SCHEMA %s CASCADE" % self.__schema)
+        with connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DROP SCHEMA %s CASCADE" % self.__schema)
 
     def __get_schema(self, name, resource):
-        # TODO: Improve schema detection; e.g. what if first row contains None fields?
-        schema = is_table(resource)
+        schema = resource.schema()
         if not schema:
             raise RuntimeError('%s is not a table' % name)
         return schema
 
-    def __add_table_stmt(self, name, schema, options):
-        sql = "CREATE FOREIGN TABLE %s.%s (" % (self.__schema, name)
+    def __add_table_stmt(self, table, schema, options):
+        sql = "CREATE FOREIGN TABLE %s (" % table
         for column_name, column_type in schema.items():
             sql += '"%s" %s,' % (column_name, SQL.TypesMap[column_type])
         sql = sql[:-1]
@@ -134,86 +177,132 @@ class SQL(Table):
         return sql
 
     def __create_tables(self):
-        with self.__conn.cursor() as cur:
-            for name, resource in self.tables.items():
-                schema = self.__get_schema(name, resource)
-
-                resource_id = str(uuid.uuid4())
-                path = os.path.join(resource_path, resource_id)
-                with open(path, 'w') as f:
-                    json.dump(resource.to_json(), f)
-                
-                # If the PostgreSQL instance is not running in the current account,
-                # make the resource file readable by all users.
-                #if not postgres_running_in_user_account:
-                #    os.chmod(f.name, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
-
-                cur.execute(self.__add_table_stmt(name, schema, dict(resource_id=resource_id)))
-
-    def _get_iterator(self):
-        with self.__conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(self.sql)
-            rows = cur.fetchmany(SQL.CHUNK_SIZE)
-            while rows:
-                for row in rows:
-                    yield self._new_tuple_from_dict(row)
-                rows = cur.fetchmany(SQL.CHUNK_SIZE)
-
-    def _get_keys():
-        raise NotImplementedError('SQL._get_keys()')
-
-    def _get_key(self, key):
-        with self.__conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM (%s) AS t LIMIT 1 OFFSET %d" % (self.sql, key))
-            row = cur.fetchone()
-            if not row:
-                raise IndexError('index out of range')
-            return self._new_tuple_from_dict(row)
-
-    def _get_slice(self, slice):
-        if slice.step:
-            raise NotImplementedError('slice step not supported')
-
-        start, stop = slice.start, slice.stop
-
-        if not start:
-            start = 0
-
-        if stop is not None and stop < start:
-            raise NotImplementedError('slice backward not supported')            
-
-        with self.__conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            if stop is not None:
-                cur.execute("SELECT * FROM (%s) AS t LIMIT %d OFFSET %d" % (self.sql, stop - start, start))
-            else:
-                cur.execute("SELECT * FROM (%s) AS t OFFSET %d" % (self.sql, start))
-
-            rows = cur.fetchmany(SQL.CHUNK_SIZE)
-            while rows:
-                for row in rows:
-                    yield self._new_tuple_from_dict(row)
-                rows = cur.fetchmany(SQL.CHUNK_SIZE)
-
-    def _get_column(self, name):
-        raise NotImplementedError('SQL._get_column()')
-
-    # def _get_column(self, name):
-    #     with self.__conn.cursor() as cur:
-    #         cur.execute("SELECT %s FROM (%s) AS t" % (name, self.sql))
-    #
-    #         rows = cur.fetchmany(SQL.CHUNK_SIZE)
-    #         while rows:
-    #             for row in rows:
-    #                 yield row[0]
-    #             rows = cur.fetchmany(SQL.CHUNK_SIZE)
+        """Create a view in the resource's schema for each input table, over the foreign table
+        shared through the catalog by all inputs with the same definition and columns.
+        """
+        # Inputs may borrow pooled connections to infer their schema (e.g. SQL inputs), so this
+        # is done before the catalog transactions hold one.
+        inputs = []
+        for name, resource in self.tables.items():
+            schema = self.__get_schema(name, resource)
+            columns = [(column_name, SQL.TypesMap[column_type]) for column_name, column_type in schema.items()]
+            payload = resource.to_json()
+            inputs.append((name, schema, payload, get_key(payload, columns)))
+
+        views = []
+        for name, schema, payload, key in inputs:
+            def create(cur, table, schema=schema, key=key):
+                cur.execute(self.__add_table_stmt(table, schema, dict(resource_id=key)))
+            views.append((name, catalog.acquire(key, payload, create)))
+            self.__keys.append(key)
+
+        with self.__cursor() as cur:
+            for name, table in views:
+                cur.execute("CREATE VIEW %s.%s AS SELECT * FROM %s" % (self.__schema, name, table))
+
+    def __get_materialized(self, query):
+        """Return the table holding the results of `query`, numbered from 0 in a `__rownum` column,
+        and the result column names, creating the table the first time.
+        """
+        if query not in self.__materialized:
+            name = 'result_%d' % len(self.__materialized)
+            with self.__cursor() as cur:
+                cur.execute("CREATE TABLE %s.%s AS SELECT *, row_number() OVER () - 1 AS __rownum FROM (%s) AS t"
+                            % (self.__schema, name, query))
+                cur.execute("CREATE INDEX ON %s.%s (__rownum)" % (self.__schema, name))
+                cur.execute("ANALYZE %s.%s" % (self.__schema, name))
+                cur.execute("SELECT * FROM %s.%s LIMIT 0" % (self.__schema, name))
+                names = [column[0] for column in cur.description][:-1]
+            self.__materialized[query] = ('%s.%s' % (self.__schema, name), names)
+        return self.__materialized[query]
+
+    def _get_range_query(self, start, stop):
+        if not self.materialize:
+            return super(SQL, self)._get_range_query(start, stop)
+        table, names = self.__get_materialized(self._get_query())
+        sql = "SELECT %s FROM %s WHERE __rownum >= %d" % (', '.join(expr.quote_name(name) for name in names), table, start)
+        if stop is not None:
+            sql += " AND __rownum < %d" % stop
+        return sql + " ORDER BY __rownum"
+
+    def _get_count_query(self, query):
+        if query in self.__materialized:
+            return "SELECT count(*) FROM %s" % self.__materialized[query][0]
+        return super(SQL, self)._get_count_query(query)
+
+    def __execute(self, cur, query):
+        if self._stats is None:
+            return cur.execute(query)
+        with self._stats.timer('sql_execute_time'):
+            return cur.execute(query)
+
+    def _get_chunks(self, query, size=None):
+        with self.__server_cursor() as cur:
+            self.__execute(cur, query)
+            names = None
+            for rows in self._fetch(cur, size or cur.itersize):
+                if names is None:
+                    names = [column[0] for column in cur.description]  # Only known after the first fetch
+                yield names, rows
+
+    def _get_description(self, query):
+        with self.__cursor() as cur:
+            cur.execute("SELECT * FROM (%s) AS t LIMIT 0" % query)
+            return [(column[0], column[1]) for column in cur.description]
+
+    def _get_scalar(self, query):
+        with self.__cursor() as cur:
+            cur.execute(query)
+            return cur.fetchone()[0]
+
+    def _get_schema(self):
+        """Sample the results, typing the query's columns after their result types."""
+        with self.__cursor() as cur:
+            cur.execute("SELECT * FROM (%s) AS t LIMIT %d" % (self._get_query(), self.SCHEMA_SAMPLE))
+            columns = [(column[0], column[1]) for column in cur.description]
+            rows = cur.fetchall()
+        if not rows:
+            return None
+        schema = get_batch_schema(self._new_batch(pandas.DataFrame.from_records(rows, columns=[name for name, oid in columns])))
+        for name, oid in columns:
+            if name in schema and name not in self._columns_added and oid in SQL.PythonTypesMap:
+                schema[name] = SQL.PythonTypesMap[oid]
+        return schema
+
+    def _get_dtypes(self, query):
+        return {name: SQL.DtypesMap.get(oid, object) for name, oid in self._get_description(query)}
+
+    def __copy_dataframe(self):
+        """Export the query results with COPY and parse them with the Pandas CSV parser.
+
+        NULLs are written as \\N, the only value parsed as missing, so that text such as '', 'NA'
+        or 'null' is kept as is.
+        """
+        query = self._get_query()
+        copy = "COPY (%s) TO STDOUT WITH CSV HEADER NULL '\\N'" % query
+        with self.__cursor() as cur:
+            cur.execute("SELECT * FROM (%s) AS t LIMIT 0" % query)
+            columns = [(column[0], column[1]) for column in cur.description]
+            with tempfile.TemporaryFile() as f:
+                if self._stats is None:
+                    cur.copy_expert(copy, f)
+                else:
+                    with self._stats.timer('sql_execute_time'):
+                        cur.copy_expert(copy, f)
+                f.seek(0)
+                data = pandas.read_csv(
+                    f,
+                    keep_default_na=False,
+                    na_values=['\\N'],
+                    dtype={name: object for name, oid in columns if oid in SQL.TextOids},
+                    parse_dates=[name for name, oid in columns if oid in SQL.DateOids])
+        for name, oid in columns:
+            if oid == SQL.BoolOid:
+                data[name] = data[name].map({'t': True, 'f': False})
+        return self._new_batch(data)
 
     def pandas_dataframe(self):
         # Overridding default implementation
-        data = {}
-        for row in iter(self):
-            if not data:
-                for key in row:
-                    data.setdefault(key, [])
-            for key in row:
-                data[key].append(row[key])
-        return pandas.DataFrame(data)
+        if not self._columns_added:
+            return self.__copy_dataframe()
+        return super(SQL, self).pandas_dataframe()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import os
+import re
+import sqlite3
+import tempfile
+
+import pandas
+from ..core import expr, get_int_option, load, Setting
+from .query import Query
+
+
+IDENTIFIER = re.compile(r'"((?:[^"]|"")*)"|([A-Za-z_][A-Za-z_0-9]*)|(?<![(\w])\*')
+
+
+def get_referenced(query):
+    """Return the identifiers used in `query`, or None if it selects all columns with `*`."""
+    names = set()
+    for match in IDENTIFIER.finditer(query):
+        quoted, name = match.group(1), match.group(2)
+        if quoted is None and name is None:
+            return None
+        names.add(quoted.replace('""', '"') if quoted is not None else name.lower())
+    return names
+
+
+def get_input_size(table):
+    """Return the size in bytes of the files read by `table`, or None if unknown."""
+    if hasattr(table, '_get_path'):
+        try:
+            return os.path.getsize(table._get_path())
+        except OSError:
+            return None
+    if isinstance(getattr(table, 'tables', None), list):
+        sizes = [get_input_size(child) for child in table.tables]
+        return None if None in sizes else sum(sizes)
+    return None
+
+
+def get_sqlite_type(dtype):
+    if dtype.kind in 'biu':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+class SQLite(Query):
+    """SQL query over tables bulk-loaded into an embedded SQLite database, for queries too small
+    to pay for the connection, DDL and foreign data wrapper round trips of PostgreSQL.
+    """
+
+    ENGINE = 'sqlite'
+    CHUNK_SIZE = Setting('sql', 'sqlite_chunk_size', 10000)
+    NO_LIMIT = '-1'
+
+    def __init__(self, sql, tables, **kwargs):
+        self.__path = None
+        self.__conn = None
+        super(SQLite, self).__init__(sql, tables, **kwargs)
+
+        self.__connect()
+        self.__load_tables()
+
+    def __del__(self):
+        if self.__conn is not None:
+            self.__conn.close()
+        if self.__path is not None:
+            os.remove(self.__path)
+
+    @staticmethod
+    def from_json(payload):
+        return SQLite(payload['sql'], Query._decode_tables(payload), **Query._decode_options(payload))
+
+    def __connect(self):
+        """Open an in-memory database, or a temporary file if the inputs are large or of unknown size."""
+        sizes = [get_input_size(resource) for resource in self.tables.values()]
+        limit = get_int_option('sql', 'sqlite_memory_size', 64 * 1024 * 1024)
+        if None in sizes or sum(sizes) > limit:
+            fd, self.__path = tempfile.mkstemp(suffix='.sqlite')
+            os.close(fd)
+            self.__conn = sqlite3.connect(self.__path, check_same_thread=False)
+            self.__conn.execute("PRAGMA journal_mode = OFF")
+            self.__conn.execute("PRAGMA synchronous = OFF")
+        else:
+            self.__conn = sqlite3.connect(':memory:', check_same_thread=False)
+
+    def __load_tables(self):
+        """Copy the columns of each table referenced by the query into the database."""
+        referenced = get_referenced(self.sql)
+        for name, resource in self.tables.items():
+            schema = resource.schema()
+            if not schema:
+                raise RuntimeError('%s is not a table' % name)
+            if referenced is not None:
+                # A copy reads only the referenced columns, leaving the caller's table unchanged
+                names = [key for key in schema if key in referenced or key.lower() in referenced]
+                if names and len(names) < len(schema):
+                    resource = load(resource.to_json()).select(*names)
+            created = False
+            for batch in resource.iter_batches():
+                if not created:
+                    self.__conn.execute("CREATE TABLE %s (%s)" % (expr.quote_name(name), ', '.join(
+                        '%s %s' % (expr.quote_name(str(column)), get_sqlite_type(dtype))
+                        for column, dtype in batch.dtypes.iteritems())))
+                    created = True
+                for column, dtype in batch.dtypes.iteritems():
+                    if dtype.kind == 'M':
+                        batch[column] = batch[column].map(lambda v: v.isoformat() if pandas.notnull(v) else None)
+                rows = batch.astype(object).where(pandas.notnull(batch), None).values.tolist()
+                self.__conn.executemany("INSERT INTO %s VALUES (%s)" % (
+                    expr.quote_name(name), ', '.join(['?'] * len(batch.columns))), rows)
+        self.__conn.commit()
+
+    def __execute(self, query):
+        if self._stats is None:
+            return self.__conn.execute(query)
+        with self._stats.timer('sql_execute_time'):
+            return self.__conn.execute(query)
+
+    def _get_chunks(self, query, size=None):
+        cur = self.__execute(query)
+        try:
+            names = [column[0] for column in cur.description]
+            for rows in self._fetch(cur, size or self.CHUNK_SIZE):
+                yield names, rows
+        finally:
+            cur.close()
+
+    def _get_description(self, query):
+        cur = self.__conn.execute("SELECT * FROM (%s) AS t LIMIT 0" % query)
+        try:
+            return [(column[0], column[1]) for column in cur.description]
+        finally:
+            cur.close()
+
+    def _get_scalar(self, query):
+        return self.__conn.execute(query).fetchone()[0]
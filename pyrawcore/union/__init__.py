@@ -27,8 +27,22 @@
 from .union import Union
 
 
-def union(*tables):
-    return Union(tables)
+def union(*tables, **kwargs):
+    """Creates a query-able RAW resource with the rows of all the given tables.
+
+    :param tables: Tables with the same columns.
+    :param concurrent: Read several tables at once on background threads, prefetching their rows: ``'ordered'`` yields the rows in table order, ``'interleaved'`` as soon as any table produces them. The ``workers`` and ``prefetch`` options of the ``union`` configuration section set the number of tables read at once (4 by default) and of batches read ahead from each (4 by default).
+    :type concurrent: str
+
+    Usage example:
+
+    >>> resource = union(csv('2014-01-01.csv'), csv('2014-01-02.csv'), concurrent='interleaved')
+
+    """
+    concurrent = kwargs.pop('concurrent', None)
+    if kwargs:
+        raise TypeError('unexpected arguments %s' % ', '.join(kwargs))
+    return Union(tables, concurrent=concurrent)
 
 
 def load(payload):
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import Queue
+import sys
+import threading
+
+
+# Queue items: a value from a source, the end of a source, or an exception raised by a source.
+VALUE, END, ERROR = range(3)
+
+
+class Producer(threading.Thread):
+    """Thread putting the values of one source into a bounded queue."""
+
+    def __init__(self, index, source, queue, stopped):
+        super(Producer, self).__init__()
+        self.daemon = True
+        self.index = index
+        self.source = source
+        self.queue = queue
+        self.stopped = stopped
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def run(self):
+        try:
+            for value in self.source():
+                if not self.put((self.index, VALUE, value)):
+                    return
+        except:
+            self.put((self.index, ERROR, sys.exc_info()))
+        else:
+            self.put((self.index, END, None))
+
+
+def prefetch(sources, workers, depth, ordered=True):
+    """Iterate over the values of `sources`, callables returning iterators, consuming up to
+    `workers` of them at once on background threads that run up to `depth` values ahead.
+
+    Ordered iteration yields the values of each source in turn; otherwise values are yielded
+    as soon as any source produces them.
+    """
+    stopped = threading.Event()
+    queues = {}
+    shared = Queue.Queue(depth * workers)
+    started = [0]
+
+    def start():
+        if started[0] < len(sources):
+            index = started[0]
+            queues[index] = Queue.Queue(depth) if ordered else shared
+            Producer(index, sources[index], queues[index], stopped).start()
+            started[0] += 1
+
+    try:
+        for i in range(workers):
+            start()
+        current = 0
+        while current < len(sources):
+            index, kind, value = (queues[current] if ordered else shared).get()
+            if kind == VALUE:
+                yield value
+            elif kind == ERROR:
+                raise value[0], value[1], value[2]
+            else:
+                del queues[index]
+                current += 1
+                start()
+    finally:
+        stopped.set()
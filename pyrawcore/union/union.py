@@ -24,56 +24,160 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
-from ..core import get_option, load, Table
+import pandas
+from ..core import get_int_option, load, Table
+from ..core.tablify import merge_schemas
+from .prefetch import prefetch
 
 
 class Union(Table):
 
-    def __init__(self, tables, columns_added=[], columns_hidden=[]):
-        super(Union, self).__init__(columns_added=columns_added, columns_hidden=columns_hidden)
+    FILTER_PUSHDOWN = True
+
+    # Tables read one after another, or several at once on background threads, yielding their
+    # rows in table order or as soon as any table produces them.
+    CONCURRENT_MODES = (None, 'ordered', 'interleaved')
+
+    def __init__(self, tables, concurrent=None, **kwargs):
+        super(Union, self).__init__(**kwargs)
+        if concurrent not in Union.CONCURRENT_MODES:
+            raise ValueError('concurrent is not ordered or interleaved')
         self.tables = tables
+        self.concurrent = concurrent
 
     @staticmethod
     def from_json(payload):
         return Union(
             tables=[load(table) for table in payload['tables']],
-            columns_added=Table._decode_columns_added(payload),
-            columns_hidden=Table._decode_columns_hidden(payload))
+            concurrent=payload.get('concurrent'),
+            **Table._decode_options(payload))
 
     def to_json(self):
         return dict(
             name='union',
             payload=dict(
                 tables=[table.to_json() for table in self.tables],
-                columns_added=self._encode_columns_added(),
-                columns_hidden=self._encode_columns_hidden()))
+                concurrent=self.concurrent,
+                **self._encode_options()))
+
+    def __iter_batches(self, batch_size, filter):
+        """Iterate over the batches of the tables, prefetching them on background threads if
+        `concurrent` is set. The number of tables read at once and of batches read ahead from each
+        are the 'union'/'workers' and 'union'/'prefetch' options.
+        """
+        sources = [lambda table=table: table.iter_batches(batch_size, filter=filter) for table in self.tables]
+        if not self.concurrent:
+            return (batch for source in sources for batch in source())
+        return prefetch(
+            sources,
+            get_int_option('union', 'workers', 4),
+            get_int_option('union', 'prefetch', 4),
+            ordered=self.concurrent == 'ordered')
 
     def _get_iterator(self):
+        if self.concurrent:
+            for batch in self.__iter_batches(None, self._get_filters()[0]):
+                for row in self._new_tuples(batch):
+                    yield row
+            return
         for table in self.tables:
-            for row in table:
-                yield row
+            if self._columns_vectorized or self._filter is not None:
+                # Conditions over the tables' columns are evaluated by the tables themselves.
+                for batch in table.iter_batches(filter=self._get_filters()[0]):
+                    for row in self._new_tuples(batch):
+                        yield row
+            elif self._columns_added or self._columns_hidden or self._columns_selected is not None \
+                    or self._row_type != 'dict':
+                for row in table:
+                    yield self._new_tuple(row.keys(), row.values())
+            else:
+                for row in table:
+                    yield row
+
+    def _get_batches(self, batch_size, filter=None):
+        for batch in self.__iter_batches(batch_size, self._get_filters(filter)[0]):
+            yield self._new_batch(batch, filter)
 
     def _get_keys(self):
         raise NotImplementedError('_get_keys')
 
+    def __new_rows(self, rows):
+        """Turn rows of the tables into records of the union."""
+        if self._columns_vectorized:
+            rows = list(rows)
+            if rows:
+                for row in self._new_tuples(pandas.DataFrame.from_records([row.values() for row in rows], columns=rows[0].keys())):
+                    yield row
+        elif self._columns_added or self._columns_hidden or self._columns_selected is not None \
+                or self._row_type != 'dict':
+            for row in rows:
+                yield self._new_tuple(row.keys(), row.values())
+        else:
+            for row in rows:
+                yield row
+
+    def _get_fingerprint(self):
+        return dict(table=self.to_json(), tables=[table._get_fingerprint() for table in self.tables])
+
+    def _get_schema(self):
+        if self._columns_added or self._columns_hidden or self._columns_selected is not None:
+            return super(Union, self)._get_schema()
+        schemas = [table.schema() for table in self.tables]
+        schemas = [schema for schema in schemas if schema is not None]
+        return merge_schemas(schemas) if schemas else None
+
+    def _get_count(self):
+        source = self._get_filters()[0]
+        if source is not None:
+            return sum(len(batch) for batch in self.__iter_batches(None, source))
+        return sum(table.count() for table in self.tables)
+
     def _get_key(self, key):
         if key < 0:
             raise NotImplementedError('index backward not support')
 
-        result = None
-        cur_key = 0
-        for table in self.tables:
-            for row in table:
-                result = row
+        if self._get_filters()[0] is not None:
+            for cur_key, row in enumerate(self._get_iterator()):
                 if cur_key == key:
-                    return result
-                else:
-                    cur_key += 1
+                    return row
+            raise IndexError('index out of range')
+
+        # Jump to the table holding the row using the tables' counts
+        for table in self.tables:
+            count = table.count()
+            if key < count:
+                return next(self.__new_rows([table[key]]))
+            key -= count
 
         raise IndexError('index out of range')
 
     def _get_slice(self, slice):
-        raise NotImplementedError('_get_slice')
+        if slice.step:
+            raise NotImplementedError('slice step not supported')
+
+        start, stop = slice.start or 0, slice.stop
+
+        if stop is not None and stop < start:
+            raise NotImplementedError('slice backward not supported')
+
+        if self._get_filters()[0] is not None:
+            for cur_key, row in enumerate(self._get_iterator()):
+                if stop is not None and cur_key >= stop:
+                    return
+                if cur_key >= start:
+                    yield row
+            return
+
+        for table in self.tables:
+            if stop is not None and stop <= 0:
+                return
+            count = table.count()
+            if start < count:
+                for row in self.__new_rows(table[start:stop]):
+                    yield row
+            start = max(0, start - count)
+            if stop is not None:
+                stop -= count
 
     def _get_column(self, name):
         raise NotImplementedError('_get_column')
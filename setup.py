@@ -6,7 +6,7 @@ setup(
     description='',
     author='Miguel Branco',
     author_email='miguel.branco@epfl.ch',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     install_requires = [
         'cloud',
         'enum34',
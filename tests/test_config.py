@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import os
+import tempfile
+import unittest
+
+from pyrawcore.core import get_bool_option, get_config, get_float_option, get_int_option, get_option
+from pyrawcore.csv import csv
+from pyrawcore.csv.csv import Csv
+
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.f = tempfile.NamedTemporaryFile(suffix='.config')
+        self.previous = os.environ.get('RAW_CONFIG')
+        os.environ['RAW_CONFIG'] = self.f.name
+        self.write("[csv]\nchunk_size = 2\nworkers = x\n[excel]\ncache_size = 0.5\n[union]\nprefetch = off\n")
+
+    def tearDown(self):
+        if self.previous is None:
+            del os.environ['RAW_CONFIG']
+        else:
+            os.environ['RAW_CONFIG'] = self.previous
+        self.f.close()
+
+    def write(self, text, mtime=0):
+        with open(self.f.name, 'w') as f:
+            f.write(text)
+        os.utime(self.f.name, (mtime, mtime))
+
+    def test_options(self):
+        self.assertEqual(get_option('csv', 'chunk_size'), '2')
+        self.assertEqual(get_int_option('csv', 'chunk_size'), 2)
+        self.assertEqual(get_float_option('excel', 'cache_size'), 0.5)
+        self.assertEqual(get_bool_option('union', 'prefetch'), False)
+        self.assertEqual(get_int_option('csv', 'missing', 7), 7)
+        self.assertEqual(get_int_option('missing', 'missing', 7), 7)
+        self.assertRaises(ValueError, get_int_option, 'csv', 'workers')
+
+    def test_reload(self):
+        config = get_config()
+        self.assertIs(get_config(), config)
+        self.write("[csv]\nchunk_size = 3\n", mtime=1)
+        self.assertIsNot(get_config(), config)
+        self.assertEqual(get_int_option('csv', 'chunk_size'), 3)
+
+    def test_setting(self):
+        self.assertEqual(Csv.CHUNK_SIZE, 2)
+        self.assertEqual(Csv.INDEX_STEP, 1000)
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a\n1\n2\n3\n")
+            f.flush()
+            table = csv(f.name)
+            self.assertEqual([len(batch) for batch in table.iter_batches()], [2, 1])
+            table.CHUNK_SIZE = 5
+            self.assertEqual([len(batch) for batch in table.iter_batches()], [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
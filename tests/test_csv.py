@@ -29,7 +29,10 @@ import os
 import tempfile
 import unittest
 
+from pyrawcore.core import load, Table
 from pyrawcore.csv import csv
+from pyrawcore.csv.cache import ColumnCache
+from pyrawcore.csv.parallel import scan
 
 
 class TestCsv(unittest.TestCase):
@@ -42,6 +45,267 @@ class TestCsv(unittest.TestCase):
             table = csv(f.name)
             self.assertEqual(list(table), [OrderedDict([('a', 1), ('b', 2)]), OrderedDict([('a', 3), ('b', 4)])])
 
+    def test_random_access(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n")
+            for i in range(100):
+                if i == 42:
+                    f.write('%d,"multi\nline"\n\n' % i)
+                else:
+                    f.write("%d,x%d\n" % (i, i))
+            f.flush()
+
+            table = csv(f.name)
+            table.INDEX_STEP = 7
+            self.assertEqual(table[0], OrderedDict([('a', 0), ('b', 'x0')]))
+            self.assertEqual(table[42], OrderedDict([('a', 42), ('b', 'multi\nline')]))
+            self.assertEqual(table[99], OrderedDict([('a', 99), ('b', 'x99')]))
+            self.assertRaises(IndexError, lambda: table[100])
+            self.assertEqual([row['a'] for row in table[40:45]], [40, 41, 42, 43, 44])
+            self.assertEqual([row['a'] for row in table[95:]], [95, 96, 97, 98, 99])
+            self.assertEqual(list(table[150:160]), [])
+            self.assertEqual(list(csv(f.name)[1500:1600]), [])
+            self.assertRaises(IndexError, lambda: table[150])
+            self.assertEqual(list(table['a'][50:53]), [50, 51, 52])
+            self.assertEqual(table['b'][43], 'x43')
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b,c\n" + "".join("%d,%d,%d\n" % (i, 10 * i, 100 * i) for i in range(30)))
+            f.flush()
+
+            table = csv(f.name, usecols=['c'])
+            table.INDEX_STEP = 5
+            self.assertEqual(table[20], OrderedDict([('c', 2000)]))
+            self.assertEqual(list(table)[20], table[20])
+
+    def test_count(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2\n3,4\n5,6")
+            f.flush()
+            self.assertEqual(csv(f.name).count(), 3)
+            self.assertEqual(csv(f.name).count(), 3)
+            self.assertEqual(csv(f.name).filter('a > 1').count(), 2)
+
+            f.write('\n\n7,"8\n"\n')
+            f.flush()
+            self.assertEqual(csv(f.name).count(), 4)
+
+            table = csv(f.name, cache=True, skiprows=1)
+            self.assertEqual(table.count(), 3)
+            list(table)     # Writes the cache
+            self.assertEqual(csv(f.name, cache=True, skiprows=1).count(), 3)
+
+    def test_schema(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b,c,d\n1,,x,\n3,2.5,y,\n5000000000,1,,\n")
+            f.flush()
+
+            table = csv(f.name)
+            table.add_column('e', lambda row: row['c'] == 'x')
+            self.assertEqual(table.schema(), OrderedDict([('a', long), ('b', float), ('c', str), ('d', float), ('e', bool)]))
+            del table['a']
+            self.assertEqual(table.schema().keys(), ['b', 'c', 'd', 'e'])
+
+            size, Table.SCHEMAS_SIZE = Table.SCHEMAS_SIZE, 2
+            try:
+                for name in ('x', 'y', 'z'):
+                    table[name] = lambda row: 1
+                    table.schema()
+                self.assertLessEqual(len(Table._schemas), 2)
+            finally:
+                Table.SCHEMAS_SIZE = size
+
+    def test_parallel(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n")
+            for i in range(100):
+                if i == 42:
+                    f.write('%d,"multi\nline"\n' % i)
+                else:
+                    f.write("%d,x%d\n" % (i, i))
+            f.flush()
+
+            expected = list(csv(f.name))
+            table = csv(f.name, parallel='ordered')
+            table.INDEX_STEP = 7
+            table.CHUNK_SIZE = 10
+            self.assertEqual(list(table), expected)
+            sizes = [len(batch) for batch in table.iter_batches(5)]
+            self.assertEqual((sum(sizes), max(sizes)), (100, 5))
+
+            table = csv(f.name, parallel='unordered')
+            table.INDEX_STEP = 7
+            table.select('a')
+            self.assertEqual(sorted(row['a'] for row in table), range(100))
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b,c\n" + "".join("%d,%d,%d\n" % (i, 10 * i, 100 * i) for i in range(30)))
+            f.flush()
+
+            table = csv(f.name, parallel='ordered', usecols=['c'])
+            table.INDEX_STEP = 5
+            table.CHUNK_SIZE = 10
+            self.assertEqual([row['c'] for row in table], [100 * i for i in range(30)])
+
+    def test_parallel_window(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("".join("%d\n" % i for i in range(10)))
+            f.flush()
+
+            args = dict(header=None, names=['a'])
+            ranges = [(0, 3), (6, 3), (12, 4)]
+            for ordered in (True, False):
+                chunks = list(scan(f.name, args, ranges, 2, ordered=ordered, window=1))
+                self.assertEqual([list(chunk['a']) for chunk in chunks], [[0, 1, 2], [3, 4, 5], [6, 7, 8, 9]])
+
+    def test_cache(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b,c\n1,x,1.5\n2,,2.5\n3,z,3.5\n")
+            f.flush()
+
+            table = csv(f.name, cache=True)
+            table.CHUNK_SIZE = 2
+            expected = list(csv(f.name))
+            self.assertEqual(list(table), expected)     # Writes the cache
+            self.assertEqual(list(table), expected)     # Reads the cache
+            self.assertEqual(list(table['a']), [1, 2, 3])
+            self.assertEqual(table[2]['a'], 3)
+            self.assertEqual(table.pandas_dataframe()['a'].tolist(), [1, 2, 3])
+
+            # A modified file gets a new cache, which replaces the stale one
+            f.write("4,w,4.5\n")
+            f.flush()
+            os.utime(f.name, (0, os.path.getmtime(f.name) + 10))
+            table = csv(f.name, cache=True)
+            self.assertEqual([row['a'] for row in table], [1, 2, 3, 4])
+            self.assertEqual([row['a'] for row in table], [1, 2, 3, 4])
+            cache_path = ColumnCache.get_path(f.name, table.args)
+            self.assertEqual(os.listdir(os.path.dirname(cache_path)), [os.path.basename(cache_path)])
+
+    def test_iter_batches(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2\n3,4\n5,6\n")
+            f.flush()
+
+            table = csv(f.name)
+            table['c'] = lambda row: row['a'] + row['b']
+            del table['b']
+            batches = list(table.iter_batches(batch_size=2))
+            self.assertEqual([len(batch) for batch in batches], [2, 1])
+            self.assertEqual(list(batches[0].columns), ['a', 'c'])
+            self.assertEqual(batches[1]['c'].tolist(), [11])
+
+            records = list(table.iter_batches(format='numpy'))
+            self.assertEqual(records[0]['c'].tolist(), [3, 7, 11])
+
+    def test_vectorized_column(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2\n3,4\n")
+            f.flush()
+
+            table = csv(f.name)
+            table.add_column('c', lambda chunk: chunk['a'] * 10 + chunk['b'], vectorized=True)
+            table['d'] = lambda row: row['c'] + 1
+            expected = [OrderedDict([('a', 1), ('b', 2), ('c', 12), ('d', 13)]),
+                        OrderedDict([('a', 3), ('b', 4), ('c', 34), ('d', 35)])]
+            self.assertEqual(list(table), expected)
+            self.assertEqual(table[1], expected[1])
+            self.assertEqual(list(load(table.to_json())), expected)
+            self.assertEqual(next(table.iter_batches())['d'].tolist(), [13, 35])
+
+    def test_compact_rows(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2\n3,4\n")
+            f.flush()
+
+            table = csv(f.name)
+            table.row_type = 'compact'
+            table['c'] = lambda row: row['a'] + row['b']
+            del table['b']
+            rows = list(table)
+            self.assertEqual(rows, [OrderedDict([('a', 1), ('c', 3)]), OrderedDict([('a', 3), ('c', 7)])])
+            self.assertEqual(rows[1].keys(), ['a', 'c'])
+            self.assertEqual(rows[1].items(), [('a', 3), ('c', 7)])
+            self.assertRaises(KeyError, lambda: rows[1]['b'])
+            self.assertEqual(dict(rows[0]), {'a': 1, 'c': 3})
+            self.assertIs(rows[0]._schema, rows[1]._schema)
+            self.assertEqual(load(table.to_json()).row_type, 'compact')
+
+    def test_select(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b,c\n1,2,x\n3,4,y\n")
+            f.flush()
+
+            table = csv(f.name)
+            table.add_column('d', lambda row: row['a'] * 2, inputs=['a'])
+            table.select('d', 'c')
+            self.assertEqual(table._get_usecols(), ['a', 'c'])
+            self.assertEqual(list(table), [OrderedDict([('d', 2), ('c', 'x')]), OrderedDict([('d', 6), ('c', 'y')])])
+            self.assertEqual(list(table.pandas_dataframe().columns), ['d', 'c'])
+            self.assertRaises(KeyError, lambda: table['b'])
+
+            table = csv(f.name)
+            del table['b']
+            self.assertEqual(table._get_usecols(), ['a', 'c'])
+            self.assertEqual(table[1], OrderedDict([('a', 3), ('c', 'y')]))
+
+    def test_filter(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,x\n2,\n3,y\n4,z\n")
+            f.flush()
+
+            table = csv(f.name)
+            table.filter("a > 1 AND NOT b = 'y'")  # b is null in the second row, so NOT b = 'y' is not true
+            self.assertEqual(list(table), [OrderedDict([('a', 4), ('b', 'z')])])
+            self.assertEqual(table[0], OrderedDict([('a', 4), ('b', 'z')]))
+            self.assertEqual(list(table['a']), [4])
+            self.assertEqual(list(load(table.to_json())['b']), ['z'])
+
+            table = csv(f.name)
+            table.add_column('c', lambda row: row['a'] * 10)
+            table.filter("c >= 30 OR b IS NULL")
+            del table['b']
+            self.assertEqual(list(table), [OrderedDict([('a', 2), ('c', 20)]), OrderedDict([('a', 3), ('c', 30)]),
+                                           OrderedDict([('a', 4), ('c', 40)])])
+            batches = list(table.iter_batches(filter="b IN ('y', 'z')"))
+            self.assertEqual(sum(len(batch) for batch in batches), 2)
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,d\n1,2020-01-15\n2,2020-07-01\n3,\n")
+            f.flush()
+
+            table = csv(f.name, parse_dates=['d']).filter("d > '2020-06-01'")
+            self.assertEqual([row['a'] for row in table], [2])
+            table = csv(f.name, parse_dates=['d'])
+            table['e'] = lambda row: row['d']
+            table.filter("e <= '2020-06-01'")
+            self.assertEqual([row['a'] for row in table], [1])
+
+    def test_stats(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,x\n2,y\n3,z\n")
+            f.flush()
+
+            sent = []
+            table = csv(f.name)
+            table['c'] = lambda row: row['a'] * 2
+            self.assertIsNone(table.stats())
+            table.enable_stats(sink=lambda table, stats: sent.append(stats))
+            self.assertEqual(len(list(table)), 3)
+            self.assertEqual(sum(len(batch) for batch in table.iter_batches(batch_size=2)), 3)
+
+            stats = table.stats()
+            self.assertEqual((stats['scans'], stats['rows'], stats['batches']), (2, 6, 2))
+            self.assertEqual(stats['chunks'], 3)
+            self.assertEqual(stats['bytes'], 2 * len("a,b\n1,x\n2,y\n3,z\n"))
+            self.assertGreater(stats['parse_time'], 0)
+            self.assertEqual(list(stats['columns']), ['c'])
+            self.assertEqual([s['scans'] for s in sent], [1, 2])
+
+            table.disable_stats()
+            self.assertEqual(list(table)[0]['c'], 2)
+            self.assertIsNone(table.stats())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from collections import OrderedDict
+import os
+import tempfile
+import unittest
+
+import pandas
+from pyrawcore.excel import excel
+from pyrawcore.excel.cache import SheetCache, sheets
+from pyrawcore.union import union
+
+
+class TestExcel(unittest.TestCase):
+
+    def setUp(self):
+        self.f = tempfile.NamedTemporaryFile(suffix='.xls')
+        pandas.DataFrame(OrderedDict([('a', [1, 2, 3]), ('b', ['x', 'y', 'z'])])).to_excel(self.f.name, index=False)
+
+    def tearDown(self):
+        self.f.close()
+
+    def test(self):
+        table = excel(self.f.name)
+        self.assertEqual(list(table), [OrderedDict([('a', 1), ('b', 'x')]), OrderedDict([('a', 2), ('b', 'y')]),
+                                       OrderedDict([('a', 3), ('b', 'z')])])
+        self.assertEqual(table[1], OrderedDict([('a', 2), ('b', 'y')]))
+        self.assertEqual(table.count(), 3)
+
+    def test_cache(self):
+        sheets.clear()
+        table = excel(self.f.name)
+        table[0]
+        size = sheets.size
+        self.assertTrue(size > 0)
+        table[1]
+        list(table[1:])
+        self.assertEqual(sheets.size, size)
+
+        stamp = os.stat(self.f.name).st_mtime
+        os.utime(self.f.name, (stamp + 10, stamp + 10))
+        self.assertEqual(table[2], OrderedDict([('a', 3), ('b', 'z')]))
+        self.assertEqual(sheets.size, 2 * size)
+
+    def test_stream(self):
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as f:
+            pandas.DataFrame(OrderedDict([('a', range(25)), ('b', ['x%d' % i for i in range(25)])])).to_excel(
+                f.name, index=False)
+            for path in (self.f.name, f.name):
+                expected = list(excel(path))
+                table = excel(path, stream=True)
+                table.CHUNK_SIZE = 2
+                self.assertEqual(list(table), expected)
+                self.assertEqual(table[2], expected[2])
+                self.assertEqual(list(table[1:3]), expected[1:3])
+                self.assertRaises(IndexError, lambda: table[len(expected)])
+                self.assertEqual(table.count(), len(expected))
+                table.select('b')
+                self.assertEqual([row['b'] for row in table], [row['b'] for row in expected])
+
+    def test_blank_rows(self):
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as f:
+            pandas.DataFrame(OrderedDict([('a', [None, 1, None, 3, None]), ('b', [None, 'x', None, 'z', None])])).to_excel(
+                f.name, index=False)
+            self.assertEqual(excel(f.name).count(), 4)
+            for stream in (False, True):
+                table = excel(f.name, stream=stream)
+                self.assertEqual(table.count(), 4)
+                self.assertEqual(len(list(table)), 4)
+                self.assertEqual(list(union(table, excel(self.f.name))[4:6]), list(excel(self.f.name)[:2]))
+
+    def test_stream_no_header(self):
+        expected = list(excel(self.f.name, header=None))
+        table = excel(self.f.name, header=None, stream=True)
+        self.assertEqual(len(expected), 4)
+        self.assertEqual(list(table), expected)
+        self.assertEqual(table[3], expected[3])
+        self.assertEqual(table.count(), 4)
+        self.assertEqual(table.schema(), excel(self.f.name, header=None).schema())
+        self.assertEqual(excel(self.f.name, header=None).schema().keys(), ['0', '1'])
+
+    def test_cache_eviction(self):
+        cache = SheetCache(250)
+        cache.put('a', pandas.DataFrame({'a': range(5)}))
+        cache.put('b', pandas.DataFrame({'a': range(5)}))
+        cache.get('a')
+        cache.put('c', pandas.DataFrame({'a': range(5)}))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        cache.put('d', pandas.DataFrame({'a': range(1000)}))
+        self.assertIsNone(cache.get('d'))
+
+
+if __name__ == '__main__':
+    unittest.main()
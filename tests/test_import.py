@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import subprocess
+import sys
+import unittest
+
+
+def get_import_time(module, runs=3):
+    """Return the best wall time, in seconds, of importing `module` in a fresh interpreter."""
+    code = 'import time; t = time.time(); import %s; print(time.time() - t)' % module
+    return min(float(subprocess.check_output([sys.executable, '-c', code])) for _ in range(runs))
+
+
+def get_imported(module):
+    code = 'import sys; import %s; print(" ".join(sys.modules))' % module
+    return set(subprocess.check_output([sys.executable, '-c', code]).split())
+
+
+class TestImport(unittest.TestCase):
+
+    # Time allowed, in seconds, to import the backends on top of their own dependencies.
+    OVERHEAD = 0.25
+
+    def test_startup(self):
+        baseline = get_import_time('pandas')
+        for module in ('pyrawcore.csv', 'pyrawcore.excel', 'pyrawcore.union'):
+            elapsed = get_import_time(module)
+            self.assertLess(elapsed, baseline * 1.5 + self.OVERHEAD,
+                            '%s took %.3fs to import (pandas %.3fs)' % (module, elapsed, baseline))
+
+    def test_lazy_dependencies(self):
+        modules = get_imported('pyrawcore.csv')
+        for dependency in ('cloud', 'prettytable'):
+            self.assertNotIn(dependency, modules)
+        self.assertNotIn('psycopg2', get_imported('pyrawcore.core'))
+
+
+if __name__ == '__main__':
+    unittest.main()
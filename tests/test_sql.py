@@ -29,8 +29,15 @@ import os
 import tempfile
 import unittest
 
+import numpy
+import pandas
+import psycopg2.pool
+from pyrawcore.core import load
 from pyrawcore.csv import csv
 from pyrawcore.sql import sql
+from pyrawcore.core.cache import get_key
+from pyrawcore.sql.catalog import get_catalog_schema
+from pyrawcore.sql.pool import connection, ConnectionPool, get_pool
 
 
 class TestSql(unittest.TestCase):
@@ -45,5 +52,200 @@ class TestSql(unittest.TestCase):
             
             self.assertEqual(list(table2), [OrderedDict([('a', 3)])])
 
+    def test_pool(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2\n3,4\n")
+            f.flush()
+
+            pool = get_pool()
+            for i in range(3):
+                table = sql('select b from t where a = %d' % (2 * i + 1), t=csv(f.name))
+                self.assertEqual(list(table), [OrderedDict([('b', 2 * i + 2)])] if i < 2 else [])
+                del table
+            self.assertIs(get_pool(), pool)
+
+    def test_catalog(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2\n3,4\n")
+            f.flush()
+
+            data = csv(f.name)
+            key = get_key(data.to_json(), [('a', 'INTEGER'), ('b', 'INTEGER')])
+            table1 = sql('select a from t where b > 2', t=data)
+            table2 = sql('select b from t where a < 2', t=data)
+            self.assertEqual(list(table1), [OrderedDict([('a', 3)])])
+            self.assertEqual(list(table2), [OrderedDict([('b', 2)])])
+            with connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT refs FROM %s.entries WHERE key = %%s" % get_catalog_schema(), (key,))
+                    self.assertEqual(cur.fetchone(), (2,))
+
+            # A self-join references the table twice, and releases both references
+            table3 = sql('select x.a from x, y where x.a = y.a', x=data, y=data)
+            self.assertEqual(len(list(table3)), 2)
+            del table3
+            with connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT refs FROM %s.entries WHERE key = %%s" % get_catalog_schema(), (key,))
+                    self.assertEqual(cur.fetchone(), (2,))
+
+    def test_pandas_dataframe(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,x\n3,y\n")
+            f.flush()
+
+            table = sql("select a, b, a > 1 as c from t", t=csv(f.name))
+            data = table.pandas_dataframe()
+            self.assertEqual(list(data.columns), ['a', 'b', 'c'])
+            self.assertEqual(data.values.tolist(), [[1, 'x', False], [3, 'y', True]])
+
+            table['d'] = lambda row: row['a'] * 2
+            self.assertEqual(list(table.pandas_dataframe()['d']), [2, 6])
+
+    def test_pandas_dataframe_text(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,NA\n2,\n3,null\n")
+            f.flush()
+
+            table = sql("select a, case a when 2 then '' else b end as b, "
+                        "case a when 1 then null else 'x' end as c from t order by a",
+                        t=csv(f.name, keep_default_na=False))
+            data = table.pandas_dataframe()
+            self.assertEqual(list(data['b']), ['NA', '', 'null'])
+            self.assertTrue(pandas.isnull(data['c'][0]))
+            self.assertEqual(list(data['b']), [row['b'] for row in table])
+
+    def test_column(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2.5\n3,\n")
+            f.flush()
+
+            table = sql('select a, b from t', t=csv(f.name))
+            self.assertEqual(list(table['a']), [1, 3])
+            self.assertEqual(table['a'][1], 3)
+            self.assertEqual(table['a'].numpy_array().dtype.kind, 'i')
+            self.assertEqual(table['b'].numpy_array().dtype.kind, 'f')
+
+    def test_materialize(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n")
+            for i in range(10):
+                f.write("%d,%d\n" % (i, i * i))
+            f.flush()
+
+            table = sql('select a, b from t where a > 2', materialize=True, t=csv(f.name))
+            self.assertEqual(table[1], OrderedDict([('a', 4), ('b', 16)]))
+            self.assertEqual(list(table[5:]), [OrderedDict([('a', 8), ('b', 64)]), OrderedDict([('a', 9), ('b', 81)])])
+            self.assertRaises(IndexError, lambda: table[7])
+
+class FakeConnection(object):
+
+    closed = False
+    autocommit = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query):
+        pass
+
+
+class FakePool(object):
+
+    def __init__(self, minconn, maxconn, dsn):
+        pass
+
+    def getconn(self):
+        return FakeConnection()
+
+    def putconn(self, conn, close=False):
+        pass
+
+
+class TestPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool_class = psycopg2.pool.ThreadedConnectionPool
+        psycopg2.pool.ThreadedConnectionPool = FakePool
+
+    def tearDown(self):
+        psycopg2.pool.ThreadedConnectionPool = self.pool_class
+
+    def test_timeout(self):
+        pool = ConnectionPool(None, 0, 2, check_interval=30, timeout=0.05)
+        conns = [pool.getconn(), pool.getconn()]
+        self.assertRaises(psycopg2.pool.PoolError, pool.getconn)
+        pool.putconn(conns.pop())
+        conns.append(pool.getconn())
+        self.assertRaises(psycopg2.pool.PoolError, pool.getconn)
+
+
+class TestSqlite(unittest.TestCase):
+
+    def test(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b,c\n1,2,x\n3,4,y\n5,6,\n")
+            f.flush()
+
+            table = sql('select a, c from t where b > 2', engine='sqlite', t=csv(f.name))
+            self.assertEqual(list(table), [OrderedDict([('a', 3), ('c', 'y')]), OrderedDict([('a', 5), ('c', None)])])
+            self.assertEqual(table[1], OrderedDict([('a', 5), ('c', None)]))
+            self.assertEqual(list(table[1:]), [OrderedDict([('a', 5), ('c', None)])])
+            self.assertEqual(list(table[:1]), [OrderedDict([('a', 3), ('c', 'y')])])
+            self.assertRaises(IndexError, lambda: table[2])
+            self.assertEqual(table.count(), 2)
+            self.assertEqual(list(load(table.to_json())), list(table))
+            self.assertEqual(list(table['a']), [3, 5])
+            self.assertEqual(table['a'].numpy_array().dtype, numpy.int64)
+            self.assertEqual(table['c'][1], None)
+            self.assertEqual(list(table['c'][1:]), [None])
+            self.assertRaises(IndexError, lambda: table['a'][2])
+
+            table.filter('a < 5')['d'] = lambda row: row['a'] * 2
+            self.assertEqual(list(table), [OrderedDict([('a', 3), ('c', 'y'), ('d', 6)])])
+            self.assertEqual(list(table.pandas_dataframe()['d']), [6])
+
+            table.enable_stats()
+            table.pandas_dataframe()
+            stats = table.stats()
+            self.assertEqual((stats['rows'], stats['chunks']), (1, 1))
+            self.assertIn('sql_execute_time', stats)
+            self.assertIn('sql_fetch_time', stats)
+            self.assertIn('d', stats['columns'])
+
+    def test_filter_nulls(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,x\n2,y\n,z\n")
+            f.flush()
+
+            for expression, expected in (("a IN (1, NULL)", ['x']), ("a NOT IN (1, NULL)", []),
+                                         ("a NOT IN (1)", ['y']), ("NOT (a IN (3, NULL))", [])):
+                local = csv(f.name).filter(expression)
+                pushed = sql('select * from t', engine='sqlite', t=csv(f.name)).filter(expression)
+                self.assertEqual([row['b'] for row in local], expected)
+                self.assertEqual([row['b'] for row in pushed], expected)
+                self.assertEqual(sum(len(batch) for batch in local.iter_batches()), len(expected))
+
+            pushed = sql('select * from t', engine='sqlite', t=csv(f.name)).filter("a < 100000000000000000000")
+            self.assertEqual([row['b'] for row in pushed], ['x', 'y'])
+
+    def test_auto(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write("a,b\n1,2\n3,4\n")
+            f.flush()
+
+            table = sql('select count(*) as n from t', engine='auto', t=csv(f.name))
+            self.assertEqual(table.to_json()['payload']['engine'], 'sqlite')
+            self.assertEqual(list(table), [OrderedDict([('n', 2)])])
+
+            self.assertRaises(ValueError, sql, 'select * from t', materialize=True, engine='sqlite', t=csv(f.name))
+
+
 if __name__ == '__main__':
     unittest.main()
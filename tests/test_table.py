@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from collections import OrderedDict
+import unittest
+
+import pandas
+from pyrawcore.core import Table
+
+
+class Rows(Table):
+    """Table over a list of rows, relying on the generic implementations."""
+
+    def __init__(self, rows, **kwargs):
+        super(Rows, self).__init__(**kwargs)
+        self.rows = rows
+
+    def to_json(self):
+        return dict(name='rows', payload=dict(rows=self.rows, **self._encode_options()))
+
+    def _get_iterator(self):
+        return self._new_tuples(pandas.DataFrame.from_records(self.rows, columns=['a', 'b']))
+
+
+class TestTable(unittest.TestCase):
+
+    def test_compact_batches(self):
+        for row_type in Table.ROW_TYPES:
+            table = Rows([[1, 'x'], [2, 'y'], [3, 'z']], row_type=row_type)
+            batches = list(table.iter_batches(batch_size=2))
+            self.assertEqual([batch['a'].tolist() for batch in batches], [[1, 2], [3]])
+            self.assertEqual(list(batches[1].columns), ['a', 'b'])
+            self.assertEqual(table.schema(), OrderedDict([('a', int), ('b', str)]))
+            self.assertEqual(table.filter('a > 1').count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+#                           Copyright (c) 2014
+#       Data Intensive Applications and Systems laboratory (DIAS)
+#                École Polytechnique Fédérale de Lausanne
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from collections import OrderedDict
+import json
+import tempfile
+import unittest
+
+from pyrawcore.core import load
+from pyrawcore.csv import csv
+from pyrawcore.union import union
+
+
+class TestUnion(unittest.TestCase):
+
+    def test(self):
+        with tempfile.NamedTemporaryFile() as f1, tempfile.NamedTemporaryFile() as f2:
+            f1.write("a,b\n1,2\n")
+            f1.flush()
+            f2.write("a,b\n3,4\n")
+            f2.flush()
+
+            table = union(csv(f1.name), csv(f2.name))
+            self.assertEqual(list(table), [OrderedDict([('a', 1), ('b', 2)]), OrderedDict([('a', 3), ('b', 4)])])
+            self.assertEqual(table[1], OrderedDict([('a', 3), ('b', 4)]))
+
+    def test_added_columns(self):
+        with tempfile.NamedTemporaryFile() as f1, tempfile.NamedTemporaryFile() as f2:
+            f1.write("a,b\n1,2\n")
+            f1.flush()
+            f2.write("a,b\n3,4\n")
+            f2.flush()
+
+            table = union(csv(f1.name), csv(f2.name))
+            table.add_column('c', lambda chunk: chunk['a'] + chunk['b'], vectorized=True)
+            table['d'] = lambda row: row['c'] * 2
+            del table['b']
+            self.assertEqual(list(table), [OrderedDict([('a', 1), ('c', 3), ('d', 6)]),
+                                           OrderedDict([('a', 3), ('c', 7), ('d', 14)])])
+
+            compact = csv(f1.name)
+            compact.row_type = 'compact'
+            table = union(compact, csv(f2.name))
+            table.add_column('c', lambda chunk: chunk['a'] + chunk['b'], vectorized=True)
+            expected = [OrderedDict([('a', 1), ('b', 2), ('c', 3)]), OrderedDict([('a', 3), ('b', 4), ('c', 7)])]
+            self.assertEqual(table[0], expected[0])
+            self.assertEqual(list(table[0:2]), expected)
+
+    def test_filter(self):
+        with tempfile.NamedTemporaryFile() as f1, tempfile.NamedTemporaryFile() as f2:
+            f1.write("a,b\n1,2\n5,6\n")
+            f1.flush()
+            f2.write("a,b\n3,4\n")
+            f2.flush()
+
+            table = union(csv(f1.name), csv(f2.name))
+            table['c'] = lambda row: row['a'] + row['b']
+            table.filter("a != 1").filter("c < 10")
+            self.assertEqual(list(table), [OrderedDict([('a', 3), ('b', 4), ('c', 7)])])
+            self.assertEqual(len(table.pandas_dataframe()), 1)
+
+    def test_count(self):
+        with tempfile.NamedTemporaryFile() as f1, tempfile.NamedTemporaryFile() as f2:
+            f1.write("a,b\n1,2\n5,6\n")
+            f1.flush()
+            f2.write("a,b\n3,\"4\n4\"\n7,8\n")
+            f2.flush()
+
+            table = union(csv(f1.name), csv(f2.name))
+            self.assertEqual(table.count(), 4)
+            self.assertEqual(table[2], OrderedDict([('a', 3), ('b', '4\n4')]))
+            self.assertEqual([row['a'] for row in table[1:3]], [5, 3])
+            self.assertEqual([row['a'] for row in table[3:]], [7])
+            self.assertRaises(IndexError, lambda: table[4])
+
+            table.filter('a > 1')
+            self.assertEqual(table.count(), 3)
+            self.assertEqual(table[2], OrderedDict([('a', 7), ('b', '8')]))
+
+    def test_schema(self):
+        with tempfile.NamedTemporaryFile() as f1, tempfile.NamedTemporaryFile() as f2:
+            f1.write("a,b\n1,2\n")
+            f1.flush()
+            f2.write("a,b\n3,4.5\n")
+            f2.flush()
+
+            self.assertEqual(union(csv(f1.name), csv(f2.name)).schema(), OrderedDict([('a', int), ('b', float)]))
+
+    def test_plan(self):
+        with tempfile.NamedTemporaryFile() as f1, tempfile.NamedTemporaryFile() as f2:
+            f1.write("a,b\n1,2\n")
+            f1.flush()
+            f2.write("a,b\n3,4\n")
+            f2.flush()
+
+            func = lambda row: row['a'] + row['b']
+            t1, t2 = csv(f1.name), csv(f2.name)
+            t1['c'] = func
+            t2['c'] = func
+            table = union(t1, t2)
+            table['d'] = lambda row: row['c'] * 2
+
+            plan = table.to_plan()
+            self.assertEqual(len(plan['functions']), 2)
+            loaded = load(json.loads(json.dumps(plan)))
+            self.assertEqual(list(loaded), list(table))
+            self.assertEqual(list(load(table.to_json())), list(table))
+            self.assertIs(loaded.tables[0]._columns_added['c'], loaded.tables[1]._columns_added['c'])
+
+    def test_concurrent(self):
+        files = [tempfile.NamedTemporaryFile() for i in range(6)]
+        try:
+            for i, f in enumerate(files):
+                f.write("a,b\n")
+                for j in range(20):
+                    f.write("%d,%d\n" % (i, j))
+                f.flush()
+
+            expected = list(union(*[csv(f.name) for f in files]))
+            table = union(*[csv(f.name) for f in files], concurrent='ordered')
+            self.assertEqual(list(table), expected)
+            self.assertEqual(next(iter(table)), expected[0])
+            table = union(*[csv(f.name) for f in files], concurrent='interleaved')
+            self.assertEqual(sorted(table, key=lambda row: (row['a'], row['b'])), expected)
+            self.assertEqual(len(table.pandas_dataframe()), 120)
+
+            table = union(csv(files[0].name), csv('/nonexistent.csv'), concurrent='interleaved')
+            self.assertRaises(IOError, list, table)
+        finally:
+            for f in files:
+                f.close()
+
+
+if __name__ == '__main__':
+    unittest.main()